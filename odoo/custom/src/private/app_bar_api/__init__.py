@@ -1 +1 @@
-from . import models, routers, schemas
+from . import models, routers, schemas, utils
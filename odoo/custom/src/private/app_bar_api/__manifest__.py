@@ -16,7 +16,10 @@
     # any module necessary for this one to work correctly
     "depends": ["base", "account", "point_of_sale", "fastapi"],
     # always loaded
-    "data": [],
+    "data": [
+        "security/ir.model.access.csv",
+        "data/ir_cron.xml",
+    ],
     # only loaded in demonstration mode
     "demo": [
         "demo/demo.xml",
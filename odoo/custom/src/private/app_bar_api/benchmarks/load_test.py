@@ -0,0 +1,164 @@
+"""
+Saturation load test of the POS API.
+
+Measures the latency of `/current_session` alone, then again while `/products2` and
+`/create_order` are saturated by concurrent clients, and fails when its 95th percentile
+grows more than `--max-slowdown` times. It runs against a live server, since the Odoo
+test server serializes requests on a single test cursor, and should be pointed at a test
+database: every order client creates real orders in the current session.
+
+Usage:
+    python load_test.py http://localhost:8069/pos_api --duration 20 --catalog-clients 8
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime, timezone
+
+REQUEST_TIMEOUT = 30
+
+
+def request(url, payload=None) -> tuple[int, bytes]:
+    """
+    Sends a GET request, or a POST request with a JSON payload.
+
+    Returns:
+    - tuple[int, bytes]: The status code and the body of the response.
+    """
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Accept-Encoding": "gzip"})
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def build_order(base_url) -> dict:
+    """
+    Builds an order of one product of the catalog.
+    """
+    status, body = request(f"{base_url}/products2?limit=1")
+    if status != 200:
+        raise SystemExit(f"Could not read a product from the catalog: HTTP {status}")
+    product = json.loads(body)[0]
+    return {
+        "products": [
+            {
+                "product_id": product["id"],
+                "name": product["name"],
+                "price_unit": product["price"],
+                "qty": 1,
+                "price_subtotal": product["price"],
+                "price_subtotal_incl": product["price"],
+            }
+        ],
+        "total": product["price"],
+        "client_phone": "",
+        "date_order": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "notes": "load test",
+    }
+
+
+def probe(url, duration, interval) -> list[float]:
+    """
+    Requests `url` every `interval` seconds for `duration` seconds.
+
+    Returns:
+    - list[float]: The latency of every successful request, in seconds.
+    """
+    latencies = []
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        start = time.monotonic()
+        status, _body = request(url)
+        if status == 200:
+            latencies.append(time.monotonic() - start)
+        time.sleep(max(0.0, interval - (time.monotonic() - start)))
+    return latencies
+
+
+def saturate(url, payload, stop, statuses, lock):
+    """
+    Sends requests to `url` back to back until `stop` is set, counting the status codes.
+    """
+    while not stop.is_set():
+        try:
+            status, _body = request(url, payload)
+        except OSError:
+            status = "error"
+        with lock:
+            statuses[(url.rsplit("/", 1)[-1].split("?")[0], status)] += 1
+
+
+def p95(latencies) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def summarize(latencies) -> str:
+    if not latencies:
+        return "no successful request"
+    return (
+        f"n={len(latencies)} p50={statistics.median(latencies) * 1000:.1f}ms "
+        f"p95={p95(latencies) * 1000:.1f}ms max={max(latencies) * 1000:.1f}ms"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("base_url", help="The root URL of the POS endpoint")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--probe-interval", type=float, default=0.2)
+    parser.add_argument("--catalog-clients", type=int, default=8)
+    parser.add_argument("--order-clients", type=int, default=8)
+    parser.add_argument("--max-slowdown", type=float, default=3.0)
+    args = parser.parse_args(argv)
+    base_url = args.base_url.rstrip("/")
+    probe_url = f"{base_url}/current_session"
+
+    baseline = probe(probe_url, args.duration, args.probe_interval)
+    print("current_session alone:      ", summarize(baseline))
+
+    order = build_order(base_url) if args.order_clients else None
+    stop = threading.Event()
+    statuses = Counter()
+    lock = threading.Lock()
+    targets = [(f"{base_url}/products2", None)] * args.catalog_clients + [
+        (f"{base_url}/create_order", order)
+    ] * args.order_clients
+    clients = [
+        threading.Thread(target=saturate, args=(url, payload, stop, statuses, lock))
+        for url, payload in targets
+    ]
+    for client in clients:
+        client.start()
+    try:
+        loaded = probe(probe_url, args.duration, args.probe_interval)
+    finally:
+        stop.set()
+        for client in clients:
+            client.join()
+    print("current_session under load: ", summarize(loaded))
+    for (route, status), count in sorted(statuses.items(), key=str):
+        print(f"  {route} {status}: {count} ({count / args.duration:.1f}/s)")
+
+    if not baseline or not loaded:
+        print("FAIL: /current_session did not answer")
+        return 1
+    slowdown = p95(loaded) / p95(baseline)
+    print(f"p95 slowdown: {slowdown:.2f}x (max {args.max_slowdown:.2f}x)")
+    return 0 if slowdown <= args.max_slowdown else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
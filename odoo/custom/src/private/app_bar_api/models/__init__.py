@@ -1,2 +1,11 @@
 from . import endpoint_inherit
-from . import pos_order
\ No newline at end of file
+from . import ir_sequence
+from . import pos_api_cache_version
+from . import pos_config
+from . import pos_order
+from . import pos_order_idempotency_key
+from . import pos_order_staging
+from . import pos_session
+from . import product_category
+from . import product_template
+from . import product_tombstone
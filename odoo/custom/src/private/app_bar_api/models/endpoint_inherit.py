@@ -1,8 +1,30 @@
+import logging
+import os
+import time
+
 from fastapi import APIRouter
+from starlette.middleware import Middleware
 
-from odoo import fields, models
+from odoo import fields, models, tools
+from odoo.service import server as odoo_server
 
 from ..routers import router
+from ..routers.status import WARM_DATABASES, warm_up
+from ..utils.compression import CompressionMiddleware
+
+_logger = logging.getLogger(__name__)
+
+
+def is_prefork_master() -> bool:
+    """
+    Tells whether the current process is the master of a multi-worker server, which
+    forks the HTTP workers after preloading the registries.
+    """
+    server = odoo_server.server
+    return (
+        isinstance(server, odoo_server.PreforkServer)
+        and getattr(server, "pid", None) == os.getpid()
+    )
 
 
 class FastapiEndpoint(models.Model):
@@ -36,3 +58,73 @@ class FastapiEndpoint(models.Model):
         if self.app == "POS_entity":
             return [router]
         return super()._get_fastapi_routers()
+
+    def _get_fastapi_app_middlewares(self) -> list[Middleware]:
+        """
+        Retrieves the middlewares wrapping the FastAPI app of the endpoint.
+
+        Returns:
+            list[Middleware]: The middlewares of the superclass. For "POS_entity"
+                              endpoints, responses are also compressed according to
+                              `Accept-Encoding`.
+        """
+        middlewares = list(super()._get_fastapi_app_middlewares())
+        if self.app == "POS_entity":
+            middlewares.append(Middleware(CompressionMiddleware))
+        return middlewares
+
+    def _register_hook(self):
+        """
+        Warms up the "POS_entity" apps whenever the registry is loaded in a worker, so
+        that the first requests of the tablets do not pay for the app build and cold
+        caches.
+
+        Nothing is warmed up while modules are being installed or updated. In the master
+        of a multi-worker server, only the caches inherited by the forked workers are
+        filled: the app itself runs an event loop thread that would not survive the
+        fork, and is built by the first request of each worker, typically the proxy's
+        `/ready` probe.
+
+        The database is only reported ready once every app is warmed up; otherwise
+        `/ready` tries again.
+        """
+        super()._register_hook()
+        if tools.config["init"] or tools.config["update"]:
+            return
+        dbname = self.env.cr.dbname
+        start = time.monotonic()
+        endpoints = self.sudo().search([("app", "=", "POS_entity")])
+        # Every app is warmed up, even after a failure.
+        warmed = [endpoint._warm_up_pos_app() for endpoint in endpoints]
+        if not all(warmed):
+            _logger.warning("POS app of %s not warmed up, it is not ready yet", dbname)
+            return
+        WARM_DATABASES.add(dbname)
+        _logger.info(
+            "POS app of %s warmed up in %.2fs", dbname, time.monotonic() - start
+        )
+
+    def _warm_up_pos_app(self):
+        """
+        Builds the app of a "POS_entity" endpoint, compiling the validators of its
+        routes, and fills the caches read by its routes as the endpoint user. Failures
+        are only logged, since the app is still built and the caches filled on demand.
+
+        Returns:
+            bool: Whether the app was warmed up.
+        """
+        self.ensure_one()
+        try:
+            with self.env.cr.savepoint():
+                if is_prefork_master():
+                    self._get_app()
+                else:
+                    self.get_app(self.root_path)
+                user = self.user_id
+                warm_up(self.env(user=user.id, context=user.context_get()))
+        except Exception:
+            _logger.warning(
+                "Could not warm up the POS app at %s", self.root_path, exc_info=True
+            )
+            return False
+        return True
@@ -0,0 +1,76 @@
+import logging
+
+from odoo import api, models
+
+_logger = logging.getLogger(__name__)
+
+
+class IrSequence(models.Model):
+    """
+    Extends 'ir.sequence' to reserve several consecutive values at once.
+    """
+
+    _inherit = "ir.sequence"
+
+    @api.model
+    def _next_block_by_code(self, sequence_code, count):
+        """
+        Returns the next `count` values of the sequence with the given code, as
+        `next_by_code` would over `count` calls, but reserved in a single database
+        operation.
+
+        Standard sequences draw all the values with one `nextval` query. "No gap"
+        sequences advance their counter by the whole block with one
+        `UPDATE ... RETURNING`, so the row is locked once per block instead of once per
+        value. Sequences using date ranges fall back to one reservation per value.
+
+        Parameters:
+        - sequence_code (str): The code of the sequence.
+        - count (int): The number of values to reserve.
+
+        Returns:
+        - list: The formatted values, or `count` times False if no sequence has that
+          code.
+        """
+        if count <= 0:
+            return []
+        self.check_access_rights("read")
+        company_id = self.env.company.id
+        sequence = self.search(
+            [("code", "=", sequence_code), ("company_id", "in", [company_id, False])],
+            order="company_id",
+            limit=1,
+        )
+        if not sequence:
+            _logger.debug(
+                "No ir.sequence has been found for code '%s'. "
+                "Please make sure a sequence is set for current company.",
+                sequence_code,
+            )
+            return [False] * count
+        sequence = sequence.sudo()
+        if sequence.use_date_range:
+            return [sequence._next() for _index in range(count)]
+
+        if sequence.implementation == "standard":
+            self.env.cr.execute(
+                "SELECT nextval(%s::regclass) FROM generate_series(1, %s)",
+                (f"ir_sequence_{sequence.id:03d}", count),
+            )
+            numbers = [row[0] for row in self.env.cr.fetchall()]
+        else:
+            sequence.flush_recordset(["number_next", "number_increment"])
+            self.env.cr.execute(
+                """
+                UPDATE ir_sequence
+                   SET number_next = number_next + number_increment * %s
+                 WHERE id = %s
+             RETURNING number_next, number_increment
+                """,
+                (count, sequence.id),
+            )
+            number_next, increment = self.env.cr.fetchone()
+            sequence.invalidate_recordset(["number_next"])
+            first = number_next - increment * count
+            numbers = [first + increment * index for index in range(count)]
+        return [sequence.get_next_char(number) for number in numbers]
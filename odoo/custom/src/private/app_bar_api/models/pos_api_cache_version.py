@@ -0,0 +1,58 @@
+from odoo import api, fields, models
+
+
+class PosApiCacheVersion(models.Model):
+    """
+    Version numbers of the lookups cached by the API in every worker, see
+    `cached_lookup`.
+
+    A version is bumped in the transaction modifying the records its lookup reads, and
+    read in the same transaction as those records, so a worker never stores values under
+    a version they do not belong to. Invalidating a lookup therefore only drops its own
+    entries, instead of clearing the registry caches of every worker.
+
+    Attributes:
+        name (fields.Char): The name of the cached lookup, unique.
+        version (fields.Integer): The current version of the lookup.
+    """
+
+    _name = "pos.api.cache.version"
+    _description = "POS API Cache Version"
+
+    name = fields.Char(required=True, readonly=True)
+    version = fields.Integer(required=True, readonly=True, default=0)
+
+    _sql_constraints = (
+        ("name_uniq", "unique(name)", "The cache name must be unique."),
+    )
+
+    @api.model
+    def _get_version(self, name) -> int:
+        """
+        Returns the current version of a cached lookup, in one indexed query.
+        """
+        self._cr.execute(
+            "SELECT version FROM pos_api_cache_version WHERE name = %s", (name,)
+        )
+        row = self._cr.fetchone()
+        return row[0] if row else 0
+
+    @api.model
+    def _bump_version(self, name):
+        """
+        Increments the version of a cached lookup, creating it if needed.
+        """
+        self._cr.execute(
+            """
+            INSERT INTO pos_api_cache_version
+                        (name, version, create_uid, create_date, write_uid, write_date)
+                 VALUES (%s, 1, %s, now() at time zone 'UTC',
+                         %s, now() at time zone 'UTC')
+            ON CONFLICT (name) DO UPDATE
+                    SET version = pos_api_cache_version.version + 1,
+                        write_uid = EXCLUDED.write_uid,
+                        write_date = EXCLUDED.write_date
+            """,
+            (name, self.env.uid, self.env.uid),
+        )
+        self.invalidate_model(["version"])
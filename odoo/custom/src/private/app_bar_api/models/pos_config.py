@@ -0,0 +1,61 @@
+from odoo import api, models
+
+from ..utils.cache import cached_lookup
+
+# Fields read by the API from the POS configuration; writing them drops the cached
+# values.
+APP_CONFIG_FIELDS = ["pricelist_id", "company_id"]
+
+
+class PosConfig(models.Model):
+    """
+    Extends 'pos.config' to cache the configuration values read by the API when creating
+    orders.
+    """
+
+    _inherit = "pos.config"
+
+    def write(self, vals):
+        result = super().write(vals)
+        if any(field in vals for field in APP_CONFIG_FIELDS):
+            self.env["pos.api.cache.version"]._bump_version(self._name)
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.env["pos.api.cache.version"]._bump_version(self._name)
+        return result
+
+    @api.model
+    def _get_app_pos_info(self, config_id):
+        """
+        Reads the pricelist and company of a POS configuration, cached in every worker
+        until the version of the 'pos.config' lookup is bumped by a write to the
+        configurations.
+
+        Parameters:
+        - config_id (int): The ID of the POS configuration.
+
+        Returns:
+        - dict: The `APP_CONFIG_FIELDS` values of the configuration, as plain IDs.
+        """
+        return cached_lookup(
+            self.env, self._name, config_id, lambda: self._read_app_pos_info(config_id)
+        )
+
+    @api.model
+    def _read_app_pos_info(self, config_id):
+        """
+        Reads the pricelist and company of a POS configuration, bypassing the cache.
+
+        Parameters:
+        - config_id (int): The ID of the POS configuration.
+
+        Returns:
+        - dict: The `APP_CONFIG_FIELDS` values of the configuration, as plain IDs.
+        """
+        return (
+            self.sudo()
+            .search([("id", "=", config_id)], limit=1)
+            .read(APP_CONFIG_FIELDS, None)[0]
+        )
@@ -1,4 +1,5 @@
 from odoo import models,fields
+from odoo.tools import sql
 
 
 class PosOrder(models.Model):
@@ -8,10 +9,35 @@ class PosOrder(models.Model):
     Attributes:
         client_phone (fields.Char): A character field to store the client's phone number. This field is stored in the database.
         notes (fields.Char): A character field to store additional notes related to the POS order. This field is also stored in the database.
+        app_login_number (fields.Integer): The login number of the session when the
+            order was created through the API.
+        app_sequence_number (fields.Integer): The sequence number of the order in its
+            session, for orders created through the API.
     """
     _inherit = "pos.order"
     
     client_phone= fields.Char(string="Teléfono", store=True)
     notes = fields.Char(string="Notas", store=True)
-    
-    
\ No newline at end of file
+    app_login_number = fields.Integer(
+        string="API Login Number", index=True, readonly=True, copy=False
+    )
+    app_sequence_number = fields.Integer(
+        string="API Sequence Number", index=True, readonly=True, copy=False
+    )
+
+    def init(self):
+        super().init()
+        self._cr.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS pos_order_app_session_sequence_uniq
+                ON pos_order (session_id, app_sequence_number)
+             WHERE app_sequence_number IS NOT NULL
+            """
+        )
+        # Supports the keyset pagination of the order listing endpoint.
+        sql.create_index(
+            self._cr,
+            "pos_order_session_date_order_id_idx",
+            self._table,
+            ["session_id", "date_order", "id"],
+        )
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+IDEMPOTENCY_KEY_RETENTION_DAYS = 7
+
+
+class PosOrderIdempotencyKey(models.Model):
+    """
+    Records the idempotency keys orders were created under through the API, so that
+    retried requests return the order created the first time.
+
+    Attributes:
+        key (fields.Char): The idempotency key sent by the client, unique.
+        order_id (fields.Many2one): The order created under the key.
+        order_reference (fields.Char): The reference returned to the client for that
+            order.
+    """
+
+    _name = "pos.order.idempotency.key"
+    _description = "POS Order Idempotency Key"
+
+    key = fields.Char(required=True, readonly=True)
+    order_id = fields.Many2one("pos.order", readonly=True, ondelete="cascade")
+    order_reference = fields.Char(readonly=True)
+
+    _sql_constraints = (
+        (
+            "key_uniq",
+            "unique(key)",
+            "An order was already created with this idempotency key.",
+        ),
+    )
+
+    @api.model
+    def _get_order_references(self, keys):
+        """
+        Returns the references of the orders created under the given keys.
+
+        Parameters:
+        - keys (list[str]): The idempotency keys.
+
+        Returns:
+        - dict: The order references by key, for the keys with a created order.
+        """
+        self.flush_model(["key", "order_reference"])
+        self._cr.execute(
+            """
+            SELECT key, order_reference
+              FROM pos_order_idempotency_key
+             WHERE key = ANY(%s) AND order_reference IS NOT NULL
+            """,
+            (list(keys),),
+        )
+        return dict(self._cr.fetchall())
+
+    @api.model
+    def _claim(self, keys):
+        """
+        Reserves idempotency keys with a single insert.
+
+        A key inserted by a concurrent transaction that is not committed yet makes this
+        one wait until that transaction ends, so a key can only be claimed once.
+
+        Parameters:
+        - keys (list[str]): The idempotency keys.
+
+        Returns:
+        - bool: True if every key was claimed, False if one of them was already used.
+        """
+        self._cr.execute(
+            """
+            INSERT INTO pos_order_idempotency_key
+                        (key, create_uid, write_uid, create_date, write_date)
+            SELECT key, %s, %s, now() AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC'
+              FROM unnest(%s::varchar[]) AS key
+                ON CONFLICT (key) DO NOTHING
+         RETURNING key
+            """,
+            (self.env.uid, self.env.uid, list(keys)),
+        )
+        return len(self._cr.fetchall()) == len(keys)
+
+    @api.model
+    def _attach_orders(self, key_orders):
+        """
+        Records the orders created under claimed keys, with a single update.
+
+        Parameters:
+        - key_orders (list[tuple[str, recordset]]): The claimed keys along with their
+          'pos.order' record.
+        """
+        if not key_orders:
+            return
+        self._cr.execute(
+            """
+            UPDATE pos_order_idempotency_key k
+               SET order_id = v.order_id, order_reference = v.order_reference
+              FROM unnest(%s::varchar[], %s::int[], %s::varchar[])
+                   AS v(key, order_id, order_reference)
+             WHERE k.key = v.key
+            """,
+            (
+                [key for key, _order in key_orders],
+                [order.id for _key, order in key_orders],
+                [order.pos_reference for _key, order in key_orders],
+            ),
+        )
+
+    @api.autovacuum
+    def _gc_idempotency_keys(self):
+        """
+        Removes the keys older than the period clients may retry within.
+        """
+        limit_date = fields.Datetime.now() - timedelta(
+            days=IDEMPOTENCY_KEY_RETENTION_DAYS
+        )
+        self.sudo().search([("create_date", "<", limit_date)]).unlink()
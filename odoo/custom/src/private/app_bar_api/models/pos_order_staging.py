@@ -0,0 +1,194 @@
+import logging
+import uuid
+from datetime import timedelta
+
+import psycopg2
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from odoo import api, fields, models
+
+from ..routers.orders import get_session, insert_orders_batch
+from ..schemas.order import Order
+
+_logger = logging.getLogger(__name__)
+
+STAGING_BATCH_SIZE = 100
+STAGING_RETENTION_DAYS = 7
+
+
+class PosOrderStaging(models.Model):
+    """
+    Orders accepted through the API in async mode, waiting to be created by a cron job.
+
+    Attributes:
+        ticket (fields.Char): The opaque identifier returned to the client, unique.
+        idempotency_key (fields.Char): The idempotency key of the order, unique when
+            given.
+        payload (fields.Text): The validated order, serialized as JSON.
+        state (fields.Selection): Whether the order is waiting, created or failed.
+        order_reference (fields.Char): The reference of the created order.
+        error (fields.Text): Why the order could not be created.
+    """
+
+    _name = "pos.order.staging"
+    _description = "POS Order Staged Through the API"
+    _order = "id"
+
+    ticket = fields.Char(
+        required=True, readonly=True, default=lambda self: uuid.uuid4().hex
+    )
+    idempotency_key = fields.Char(readonly=True)
+    payload = fields.Text(required=True, readonly=True)
+    state = fields.Selection(
+        [("pending", "Pending"), ("done", "Created"), ("failed", "Failed")],
+        required=True,
+        default="pending",
+        index=True,
+    )
+    order_reference = fields.Char(readonly=True)
+    error = fields.Text(readonly=True)
+
+    _sql_constraints = (
+        ("ticket_uniq", "unique(ticket)", "The ticket must be unique."),
+        (
+            "idempotency_key_uniq",
+            "unique(idempotency_key)",
+            "An order was already staged with this idempotency key.",
+        ),
+    )
+
+    @api.model
+    def _stage(self, order):
+        """
+        Stages a validated order and wakes up the cron job creating staged orders.
+
+        An order with an idempotency key already staged is not staged again, the ticket
+        of the staged order is returned instead, including when it is being committed
+        by a concurrent request.
+
+        Parameters:
+        - order (Order): The order to create.
+
+        Returns:
+        - str: The ticket of the staged order.
+        """
+        key = order.idempotency_key
+        if key:
+            staging = self._get_by_idempotency_key(key)
+            if staging:
+                return staging.ticket
+        try:
+            with self.env.cr.savepoint():
+                staging = self.sudo().create(
+                    {"idempotency_key": key, "payload": order.model_dump_json()}
+                )
+        except psycopg2.IntegrityError:
+            if not key:
+                raise
+            # Staged by a concurrent request committed since this one started.
+            with self.env.registry.cursor() as cr:
+                staging = self.with_env(self.env(cr=cr))._get_by_idempotency_key(key)
+                if not staging:
+                    raise
+                return staging.ticket
+        self.env.ref("app_bar_api.ir_cron_materialize_staged_orders").sudo()._trigger()
+        return staging.ticket
+
+    @api.model
+    def _get_by_ticket(self, ticket):
+        """
+        Returns the staged order with the given ticket, or an empty recordset.
+        """
+        return self.sudo().search([("ticket", "=", ticket)], limit=1)
+
+    @api.model
+    def _get_by_idempotency_key(self, key):
+        """
+        Returns the staged order with the given idempotency key, or an empty recordset.
+        """
+        return self.sudo().search([("idempotency_key", "=", key)], limit=1)
+
+    @api.model
+    def _cron_materialize(self, batch_size=STAGING_BATCH_SIZE):
+        """
+        Creates the pending staged orders, one batch at a time.
+
+        Batches are locked with `SKIP LOCKED`, so concurrent runs never process the same
+        order, and created in bulk like `/create_orders`. The job retriggers itself
+        while pending orders remain. Without open session, orders stay pending until one
+        is opened.
+
+        Orders sharing an idempotency key, such as those staged before keys were
+        recorded, are only created once, and all get the reference of that order.
+
+        Only orders that cannot be created, like invalid payloads, are marked as failed.
+        Transient database errors, such as serialization failures, are raised, so that
+        the run is rolled back and its orders stay pending until the next run.
+
+        Parameters:
+        - batch_size (int): The maximum number of orders created per run.
+        """
+        self.flush_model(["state"])
+        self.env.cr.execute(
+            """
+            SELECT id FROM pos_order_staging
+             WHERE state = 'pending'
+          ORDER BY id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+            """,
+            (batch_size,),
+        )
+        stagings = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if not stagings:
+            return
+        try:
+            session = get_session(self.env)
+        except HTTPException:
+            _logger.info(
+                "No open POS session, %d staged orders left pending", len(stagings)
+            )
+            return
+
+        valid = []
+        for staging in stagings:
+            try:
+                valid.append((staging, Order.model_validate_json(staging.payload)))
+            except ValidationError as e:
+                staging.write({"state": "failed", "error": f"Invalid order data: {e}"})
+        if valid:
+            # The position in `orders` of each valid staged order.
+            orders, positions, key_positions = [], [], {}
+            for _staging, order in valid:
+                key = order.idempotency_key
+                if key not in key_positions:
+                    if key:
+                        key_positions[key] = len(orders)
+                    positions.append(len(orders))
+                    orders.append(order)
+                else:
+                    positions.append(key_positions[key])
+            results = insert_orders_batch(self.env, session, orders)
+            for (staging, _order), position in zip(valid, positions, strict=True):
+                result = results[position]
+                staging.write(
+                    {
+                        "state": "done" if result.order_reference else "failed",
+                        "order_reference": result.order_reference,
+                        "error": result.error,
+                    }
+                )
+        if len(stagings) == batch_size:
+            self.env.ref("app_bar_api.ir_cron_materialize_staged_orders")._trigger()
+
+    @api.autovacuum
+    def _gc_staged_orders(self):
+        """
+        Removes the created and failed staged orders older than the period clients may
+        poll their ticket within.
+        """
+        limit_date = fields.Datetime.now() - timedelta(days=STAGING_RETENTION_DAYS)
+        self.sudo().search(
+            [("state", "in", ("done", "failed")), ("write_date", "<", limit_date)]
+        ).unlink()
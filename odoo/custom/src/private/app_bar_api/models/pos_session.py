@@ -0,0 +1,155 @@
+from psycopg2 import sql
+
+from odoo import api, models
+
+from ..utils.cache import cached_lookup
+
+# Fields read by the API to describe the current session.
+APP_SESSION_FIELDS = ["id", "user_id", "config_id", "sequence_number", "login_number"]
+# Fields whose modification drops the cached session. The session sequence number is
+# left out since the API numbers its orders with a sequence of its own, and the login
+# number, written whenever the POS UI is loaded, since orders read it along with their
+# sequence numbers.
+APP_SESSION_CACHE_FIELDS = ["state", "user_id", "config_id"]
+# Name of the PostgreSQL sequence numbering the API orders of a session, by session ID.
+APP_SEQUENCE_NAME = "pos_session_app_seq_%d"
+
+
+class PosSession(models.Model):
+    """
+    Extends 'pos.session' with the PostgreSQL sequence numbering the orders created
+    through the API in each session, and caches the current session read by the API
+    until a session changes state.
+    """
+
+    _inherit = "pos.session"
+
+    def init(self):
+        super().init()
+        # Sessions opened before their sequence existed continue after the orders they
+        # already hold, which the previous numberings could not exceed.
+        self._cr.execute(
+            """
+            SELECT s.id, GREATEST(
+                       (SELECT max(o.app_sequence_number)
+                          FROM pos_order o
+                         WHERE o.session_id = s.id),
+                       (SELECT count(*)
+                          FROM pos_order o
+                         WHERE o.session_id = s.id
+                           AND o.pos_reference LIKE 'Pedido %')
+                   )
+              FROM pos_session s
+             WHERE s.state != 'closed'
+            """
+        )
+        for session_id, last_number in self._cr.fetchall():
+            self._create_app_sequence(session_id, (last_number or 0) + 1)
+
+    def _create_app_sequence(self, session_id, number_next=1):
+        """
+        Creates the sequence numbering the API orders of a session, unless it already
+        exists.
+        """
+        self._cr.execute(
+            sql.SQL("CREATE SEQUENCE IF NOT EXISTS {} START WITH %s").format(
+                sql.Identifier(APP_SEQUENCE_NAME % session_id)
+            ),
+            (number_next,),
+        )
+
+    def _drop_app_sequences(self):
+        """
+        Drops the sequences numbering the API orders of the sessions.
+        """
+        if not self.ids:
+            return
+        names = [
+            sql.Identifier(APP_SEQUENCE_NAME % session_id) for session_id in self.ids
+        ]
+        self._cr.execute(
+            sql.SQL("DROP SEQUENCE IF EXISTS {}").format(sql.SQL(", ").join(names))
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        sessions = super().create(vals_list)
+        for session in sessions:
+            self._create_app_sequence(session.id)
+        self.env["pos.api.cache.version"]._bump_version(self._name)
+        return sessions
+
+    def write(self, vals):
+        result = super().write(vals)
+        if vals.get("state") == "closed":
+            # Closed sessions cannot be reopened, nor receive orders anymore.
+            self._drop_app_sequences()
+        if any(field in vals for field in APP_SESSION_CACHE_FIELDS):
+            self.env["pos.api.cache.version"]._bump_version(self._name)
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self._drop_app_sequences()
+        self.env["pos.api.cache.version"]._bump_version(self._name)
+        return result
+
+    @api.model
+    def _get_app_current_session(self):
+        """
+        Reads the current open or opening control session, cached in every worker.
+
+        The cached session is dropped whenever a session is created, deleted, or any of
+        the `APP_SESSION_CACHE_FIELDS` is written, by bumping the version of the
+        'pos.session' lookup. Its login number may therefore lag behind.
+
+        Returns:
+        - dict | None: The `APP_SESSION_FIELDS` values of the session, or None if no
+          session is open.
+        """
+        return cached_lookup(self.env, self._name, None, self._read_app_current_session)
+
+    @api.model
+    def _read_app_current_session(self):
+        """
+        Reads the current open or opening control session, bypassing the cache.
+
+        Returns:
+        - dict | None: The `APP_SESSION_FIELDS` values of the session, or None if no
+          session is open.
+        """
+        sessions = (
+            self.sudo()
+            .search([("state", "in", ("opened", "opening_control"))], limit=1)
+            .read(APP_SESSION_FIELDS, None)
+        )
+        return sessions[0] if sessions else None
+
+    def _reserve_app_sequence_numbers(self, count=1):
+        """
+        Reserves the next `count` order sequence numbers of the session.
+
+        The numbers are drawn with `nextval` from the sequence of the session, which
+        takes no row lock, so concurrent reservations neither wait for each other nor
+        conflict under repeatable read isolation. Numbers drawn by a transaction that is
+        rolled back are not reused, leaving gaps in the numbering.
+
+        Parameters:
+        - count (int): The number of sequence numbers to reserve.
+
+        Returns:
+        - tuple[list[int], int]: The reserved sequence numbers in ascending order, and
+          the login number of the session.
+        """
+        self.ensure_one()
+        self.flush_recordset(["login_number"])
+        self._cr.execute(
+            """
+            SELECT nextval(%s::regclass), s.login_number
+              FROM pos_session s, generate_series(1, %s)
+             WHERE s.id = %s
+            """,
+            (APP_SEQUENCE_NAME % self.id, count, self.id),
+        )
+        rows = self._cr.fetchall()
+        return sorted(number for number, _login_number in rows), rows[0][1] or 0
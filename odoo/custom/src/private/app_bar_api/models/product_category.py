@@ -0,0 +1,28 @@
+from odoo import api, models
+
+from ..utils.cache import invalidate_catalog
+
+
+class ProductCategory(models.Model):
+    """
+    Extends 'product.category' to keep the in-process POS catalog cache up to date,
+    since the category name is part of the served catalog.
+    """
+
+    _inherit = "product.category"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        invalidate_catalog(self.env)
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        invalidate_catalog(self.env)
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        invalidate_catalog(self.env)
+        return result
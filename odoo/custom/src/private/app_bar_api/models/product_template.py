@@ -0,0 +1,76 @@
+import logging
+
+import psycopg2
+
+from odoo import api, models
+from odoo.tools import sql
+
+from ..utils.cache import invalidate_catalog
+
+_logger = logging.getLogger(__name__)
+
+
+class ProductTemplate(models.Model):
+    """
+    Extends 'product.template' to keep the in-process POS catalog cache up to date.
+
+    Any creation, modification or deletion of a template drops the cached catalogs of
+    the database in the current worker. Templates leaving the catalog are also logged as
+    'pos.product.tombstone' records for the catalog change feed.
+    """
+
+    _inherit = "product.template"
+
+    def init(self):
+        super().init()
+        # Supports the filter on POS-available templates of the catalog endpoints.
+        sql.create_index(
+            self._cr,
+            "product_template_available_in_pos_active_idx",
+            self._table,
+            ["available_in_pos"],
+            where="active",
+        )
+        # Supports the fuzzy name search of the catalog, in every language.
+        try:
+            with self._cr.savepoint():
+                self._cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error:
+            _logger.warning(
+                "pg_trgm is not available, the product name search will not be fuzzy"
+            )
+            return
+        sql.create_index(
+            self._cr,
+            "product_template_name_trgm_idx",
+            self._table,
+            ["(jsonb_path_query_array(name, '$.*')::text) gin_trgm_ops"],
+            method="gin",
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        invalidate_catalog(self.env)
+        return records
+
+    def write(self, vals):
+        reason = None
+        if "active" in vals and not vals["active"]:
+            reason = "archived"
+        elif "available_in_pos" in vals and not vals["available_in_pos"]:
+            reason = "unavailable"
+        leaving_ids = []
+        if reason:
+            leaving_ids = self.filtered(lambda t: t.active and t.available_in_pos).ids
+        result = super().write(vals)
+        self.env["pos.product.tombstone"]._record(leaving_ids, reason)
+        invalidate_catalog(self.env)
+        return result
+
+    def unlink(self):
+        leaving_ids = self.filtered("available_in_pos").ids
+        result = super().unlink()
+        self.env["pos.product.tombstone"]._record(leaving_ids, "deleted")
+        invalidate_catalog(self.env)
+        return result
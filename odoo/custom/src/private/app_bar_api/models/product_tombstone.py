@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+TOMBSTONE_RETENTION_DAYS = 30
+
+
+class PosProductTombstone(models.Model):
+    """
+    A log of the product templates that left the POS catalog, used by the catalog change
+    feed.
+
+    Attributes:
+        product_tmpl_id (fields.Integer): The ID of the template. It is not a relation
+                                          since the template may have been deleted.
+        reason (fields.Selection): Why the template left the catalog.
+        date (fields.Datetime): When the template left the catalog.
+    """
+
+    _name = "pos.product.tombstone"
+    _description = "POS Catalog Removed Product"
+    _order = "date, id"
+
+    product_tmpl_id = fields.Integer(
+        string="Product Template ID", required=True, index=True
+    )
+    reason = fields.Selection(
+        [
+            ("archived", "Archived"),
+            ("unavailable", "Removed from Point of Sale"),
+            ("deleted", "Deleted"),
+        ],
+        required=True,
+    )
+    date = fields.Datetime(required=True, index=True, default=fields.Datetime.now)
+
+    @api.model
+    def _record(self, template_ids, reason):
+        """
+        Logs that the given product templates left the POS catalog.
+
+        Parameters:
+        - template_ids (list[int]): The IDs of the product templates.
+        - reason (str): One of the `reason` selection values.
+        """
+        if template_ids:
+            self.sudo().create(
+                [
+                    {"product_tmpl_id": tmpl_id, "reason": reason}
+                    for tmpl_id in template_ids
+                ]
+            )
+
+    @api.autovacuum
+    def _gc_tombstones(self):
+        """
+        Removes the tombstones older than the sync token validity.
+        """
+        limit_date = fields.Datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+        self.sudo().search([("date", "<", limit_date)]).unlink()
@@ -1,9 +1,15 @@
+from . import categories
 from . import orders
 from . import products
+from . import status
 from fastapi import APIRouter
 from .products import product_router
 from .orders import order_router
+from .categories import category_router
+from .status import status_router
 
 router = APIRouter()
 router.include_router(product_router)
 router.include_router(order_router)
+router.include_router(category_router)
+router.include_router(status_router)
@@ -0,0 +1,89 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Request, Response
+
+from odoo.api import Environment
+
+from odoo.addons.fastapi.dependencies import odoo_env
+
+from ..schemas.category import CategoryNode, CategoryTree
+from ..utils.concurrency import orm_route
+from ..utils.responses import PosJSONResponse, json_response
+from .products import (
+    get_cached_catalog,
+    get_catalog_version,
+    is_not_modified,
+    search_pos_templates,
+)
+
+category_router = APIRouter(tags=["categories"], default_response_class=PosJSONResponse)
+
+
+@category_router.get(
+    "/categories/tree", response_model=list[CategoryNode], status_code=200
+)
+@orm_route
+def get_category_tree(
+    env: Annotated[Environment, Depends(odoo_env)], request: Request
+) -> list[CategoryNode]:
+    """
+    Get the product categories of the POS catalog as a tree.
+
+    Each node lists the IDs of the POS-available products directly in that category, and
+    branches without any product are left out. The tree is cached per catalog version
+    and the response supports the same conditional requests as `/products`.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+    - request: Request - The incoming request, used for the conditional headers.
+
+    Returns:
+    - list[CategoryNode]: The root categories, with their subcategories nested in
+      `children`.
+    """
+    version = get_catalog_version(env).variant("categories_tree")
+    if is_not_modified(request, version):
+        return Response(status_code=304, headers=version.headers())
+    tree = get_cached_catalog(env, "categories_tree", version, build_category_tree)
+    return json_response(tree, CategoryTree, headers=version.headers())
+
+
+def build_category_tree(env) -> list[CategoryNode]:
+    """
+    Builds the category tree of the POS catalog from one read of the categories and one
+    read of the products.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+
+    Returns:
+    - list[CategoryNode]: The root categories holding POS-available products in their
+                          subtree, in the category order.
+    """
+    product_ids = {}
+    for product in search_pos_templates(env).sorted("id").read(["categ_id"]):
+        product_ids.setdefault(product["categ_id"][0], []).append(product["id"])
+
+    categories = env["product.category"].search_read([], ["name", "parent_id"])
+    children = {}
+    for category in categories:
+        parent_id = category["parent_id"][0] if category["parent_id"] else None
+        children.setdefault(parent_id, []).append(category)
+    known_ids = {category["id"] for category in categories}
+
+    def build(category):
+        nodes = [node for node in map(build, children.get(category["id"], [])) if node]
+        ids = product_ids.get(category["id"], [])
+        if not ids and not nodes:
+            return None
+        return CategoryNode(
+            id=category["id"], name=category["name"], product_ids=ids, children=nodes
+        )
+
+    # Categories whose parent is not readable are shown as roots.
+    roots = [
+        category
+        for category in categories
+        if not category["parent_id"] or category["parent_id"][0] not in known_ids
+    ]
+    return [node for node in map(build, roots) if node is not None]
@@ -1,22 +1,81 @@
+import base64
+import binascii
+import json
+import logging
 from datetime import datetime
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Annotated, Any
+
+import anyio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from psycopg2 import OperationalError
+from pydantic import ValidationError
+
+from odoo import fields
 from odoo.api import Environment
+
 from odoo.addons.fastapi.dependencies import odoo_env
-from ..schemas.order import Order
-from ..schemas.session import Session
-from pydantic import ValidationError
 
-order_router = APIRouter(tags=["orders"])
+from ..schemas.order import (
+    Order,
+    OrderFeed,
+    OrderInfo,
+    OrderInfoList,
+    OrderLineInfo,
+    OrderResult,
+    OrderResultList,
+    OrderTicket,
+)
+from ..schemas.session import Session
+from ..utils.concurrency import RouteLimiter, orm_route, run_orm
+from ..utils.order_feed import notify_orders, order_feed
+from ..utils.replica import read_only_env
+from ..utils.responses import PosJSONResponse, json_response
+
+_logger = logging.getLogger(__name__)
+
+order_router = APIRouter(tags=["orders"], default_response_class=PosJSONResponse)
+
+# The limits are shared by all the workers of the database.
+create_order_limiter = RouteLimiter("create_order", 64, queue_size=128, timeout=2)
+create_orders_limiter = RouteLimiter("create_orders", 16, queue_size=32, timeout=2)
+list_orders_limiter = RouteLimiter("list_orders", 32, queue_size=64)
+# Waiting feed requests hold their worker rather than the database, so they are limited
+# in each worker, below the 40 threads anyio runs the waits in by default.
+order_feed_limiter = RouteLimiter(
+    "order_feed", 32, queue_size=0, timeout=0, per_worker=True
+)
+
+DEFAULT_FEED_TIMEOUT = 25
+MAX_FEED_TIMEOUT = 30
+MAX_FEED_ORDERS = 100
+ORDER_INFO_FIELDS = [
+    "pos_reference",
+    "date_order",
+    "amount_total",
+    "client_phone",
+    "notes",
+    "state",
+]
+DEFAULT_ORDER_PAGE_SIZE = 50
+MAX_ORDER_PAGE_SIZE = 500
+ORDER_LINE_INFO_FIELDS = [
+    "product_id",
+    "full_product_name",
+    "qty",
+    "price_unit",
+    "price_subtotal_incl",
+]
 
 
 @order_router.get("/current_session", status_code=200, response_model=Session)
-async def current_session(env: Annotated[Environment, Depends(odoo_env)]) -> Session:
+@orm_route
+def current_session(env: Annotated[Environment, Depends(odoo_env)]) -> Session:
     """
     Get the current session.
 
     This function retrieves the current session from the Odoo environment and returns it as a response. 
     The session is obtained by calling the `get_session` function, passing the `env` parameter.
+    It is read from the read replica when one is configured and up to date.
 
     Parameters:
     - env (Environment): The Odoo environment.
@@ -28,16 +87,19 @@ async def current_session(env: Annotated[Environment, Depends(odoo_env)]) -> Ses
     - HTTPException: If no open session is found or if there is an error validating the session.
 
     """
-    return get_session(env)
+    with read_only_env(env) as read_env:
+        return get_session(read_env)
       
 def get_session(env):
     """
     Retrieves the current open or opening control session from the environment.
 
-    This function searches for sessions that are either in the 'opened' or 'opening_control' state.
-    It reads specific fields from the found session records. If no session is found, it raises an HTTPException
-    with a status code of 204 indicating no open session was found. If the session data fails validation,
-    it raises an HTTPException with a status code of 500 and provides the error detail.
+    This function looks for a session that is either in the 'opened' or
+    'opening_control' state. It reads specific fields from the found session record,
+    which are cached in every worker until a session changes state. If no session is
+    found, it raises an HTTPException with a status code of 204 indicating no open
+    session was found. If the session data fails validation, it raises an HTTPException
+    with a status code of 500 and provides the error detail.
 
     Parameters:
     - env (dict): The environment dictionary containing session information and methods.
@@ -45,38 +107,72 @@ def get_session(env):
     Returns:
     - Session: A validated session object.
     """
-    session = (
-        env["pos.session"]
-        .sudo()
-        .search(["|", ("state", "=", "opened"), ("state", "=", "opening_control")])
-        .read(["id", "user_id", "config_id", "sequence_number", "login_number"], None)
-    )
+    session = env["pos.session"]._get_app_current_session()
 
     if not session:
         raise HTTPException(status_code=204, detail="Not open session found")
     try:
-        return Session.model_validate(session[0])
+        return Session.model_validate(session)
     except ValidationError as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
-@order_router.post("/create_order", status_code=201)
-async def create_order(env: Annotated[Environment, Depends(odoo_env)], order_data: Order):
+@order_router.post(
+    "/create_order", status_code=201, dependencies=[Depends(create_order_limiter)]
+)
+@orm_route
+def create_order(
+    env: Annotated[Environment, Depends(odoo_env)],
+    order_data: Order,
+    idempotency_key: Annotated[str | None, Header()] = None,
+    prefer: Annotated[str | None, Header()] = None,
+):
     """
     Create a new order.
 
+    With a `Prefer: respond-async` header, the order is only validated and staged, and a
+    202 response with a ticket is returned at once. The order is then created in the
+    background, and its status can be followed at `/orders/{ticket}`.
+
+    When an idempotency key is given, through the `Idempotency-Key` header or the
+    `idempotency_key` field of the order, retries of an order already created return its
+    original reference without creating it again, including when the original is still
+    being committed as the retry arrives. In async mode, retries of an order already
+    staged return its ticket without staging it again.
+
     Parameters:
     - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
     - order_data: Order - The order data.
+    - idempotency_key: str | None - The `Idempotency-Key` header, which takes precedence
+      over the field.
+    - prefer: str | None - The `Prefer` header.
 
     Returns:
-    - dict - A dictionary containing the message and the order reference.
+    - dict - A dictionary containing the message and the order reference, or the ticket
+      in async mode.
 
     Raises:
     - HTTPException(400) - If the order data is invalid or if the order creation fails.
+    - HTTPException(409) - If an order with the same idempotency key is being created.
     - HTTPException(500) - If there is an unexpected error during the order creation.
+    - OperationalError - On transient database errors, for Odoo to retry the request.
     """
-    
+    if idempotency_key:
+        order_data.idempotency_key = idempotency_key
+    if order_data.idempotency_key:
+        key = order_data.idempotency_key
+        reference = get_order_references(env, [key]).get(key)
+        if reference:
+            return {"message": "Order already created", "order_reference": reference}
+
+    if prefer and "respond-async" in prefer.lower():
+        ticket = env["pos.order.staging"]._stage(order_data)
+        return json_response(
+            {"message": "Order accepted", "ticket": ticket},
+            status_code=202,
+            headers={"Location": f"/orders/{ticket}"},
+        )
+
     try:
         
         pos_session = get_session(env)
@@ -84,86 +180,623 @@ async def create_order(env: Annotated[Environment, Depends(odoo_env)], order_dat
         # if not Order.validate_model(order_data):
         #     raise ValidationError('Invalid order data')
         
-        new_order = insert_order(env, pos_session, order_data)
+        with env.cr.savepoint():
+            new_order = insert_idempotent_orders(env, pos_session, [order_data])
         
         if not new_order:
             raise HTTPException(status_code=400, detail="Failed to create order")
-        
-        insert_lines(env, order_data, new_order)
             
         return {"message": "Order created successfully", "order_reference": new_order.pos_reference}
     
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=f"Invalid order data: {str(e)}")
     except HTTPException as e:
+        if e.status_code == 409:
+            key = order_data.idempotency_key
+            reference = get_committed_order_references(env, [key]).get(key)
+            if reference:
+                return {
+                    "message": "Order already created",
+                    "order_reference": reference,
+                }
+            raise
         raise HTTPException(status_code=400, detail=f"Failed to create order: {str(e)}")
+    except OperationalError:
+        # Serialization failures, lock timeouts and deadlocks are retried by Odoo.
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
     
 
-def insert_order(env, session, order):
+@order_router.post(
+    "/create_orders",
+    status_code=200,
+    response_model=list[OrderResult],
+    dependencies=[Depends(create_orders_limiter)],
+)
+@orm_route
+def create_orders(
+    env: Annotated[Environment, Depends(odoo_env)], orders_data: list[dict[str, Any]]
+) -> list[OrderResult]:
     """
-    Inserts an order into the Point of Sale (POS) system.
+    Create several orders at once.
 
-    This function takes in the environment dictionary and an order object as parameters. 
-    It performs the following steps:
+    The session and POS configuration are resolved once, and all the valid orders, then
+    all their lines, are created with a single multi-record create each. If that fails,
+    the orders are created one by one so that a faulty order does not prevent the others
+    from being created. Orders whose `idempotency_key` was already used get the
+    reference of the order created the first time.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+    - orders_data: list[dict] - The orders, each following the `Order` schema.
 
-    1. Generates a unique reference for the order using the '_generate_unique_ref' function.
-    2. Calculates the sequence number for the order using the 'calculate_sequence_number' function.
-    3. Retrieves the Point of Sale (POS) information for the session using the 'get_pos_info' function.
-    4. Formats the current datetime using the 'get_formated_datetime' function.
-    5. Creates a new order in the POS system using the 'pos.order' model and the provided data.
+    Returns:
+    - list[OrderResult]: For each order, in the same order, either its reference or the
+      reason it was not created.
+
+    Raises:
+    - HTTPException(400) - If there is no open session.
+    """
+    try:
+        pos_session = get_session(env)
+    except HTTPException as e:
+        raise HTTPException(
+            status_code=400, detail=f"Failed to create orders: {e.detail}"
+        ) from e
+
+    results = [None] * len(orders_data)
+    valid = []
+    for index, payload in enumerate(orders_data):
+        try:
+            valid.append((index, Order.model_validate(payload)))
+        except ValidationError as e:
+            results[index] = OrderResult(error=f"Invalid order data: {e}")
+
+    references = get_order_references(
+        env, [order.idempotency_key for _index, order in valid if order.idempotency_key]
+    )
+    for index, order in valid:
+        if order.idempotency_key in references:
+            reference = references[order.idempotency_key]
+            results[index] = OrderResult(order_reference=reference)
+    valid = [(index, order) for index, order in valid if results[index] is None]
+    if not valid:
+        return json_response(results, OrderResultList)
+
+    batch_orders = [order for _index, order in valid]
+    batch_results = insert_orders_batch(env, pos_session, batch_orders)
+    for (index, _order), result in zip(valid, batch_results, strict=True):
+        results[index] = result
+    return json_response(results, OrderResultList)
+
+
+def insert_orders_batch(env, session, orders):
+    """
+    Inserts a batch of orders, isolating the failing ones.
+
+    All the orders and their lines are first created together in a savepoint. If that
+    fails, they are created one by one, each in its own savepoint. Transient database
+    errors, such as serialization failures, are raised instead, so that the whole
+    transaction is retried.
 
     Parameters:
     - env (dict): The environment dictionary containing session information and methods.
-    - session(Session): The current open or opening control session from the environment.
-    - order (Order): The order object containing the order details.
+    - session(Session): The current open or opening control session from the
+      environment.
+    - orders (list[Order]): The order objects containing the order details.
 
     Returns:
-    - int: The ID of the newly created order in the POS system.
+    - list[OrderResult]: For each order, in the same order, its reference or the
+      creation error.
     """
-    sequence = env["ir.sequence"].next_by_code("pos.order.pruebas")
-    session.sequence_number = calculate_sequence_number(env, session)
-    current_datetime = get_formated_datetime()
-    pos_info = get_pos_info(env, session.config_id)
-    ref = _generate_unique_ref(session)
-    
-    return (
+    try:
+        with env.cr.savepoint():
+            new_orders = insert_idempotent_orders(env, session, orders)
+        return [
+            OrderResult(order_reference=new_order.pos_reference)
+            for new_order in new_orders
+        ]
+    except OperationalError:
+        raise
+    except Exception:
+        _logger.exception(
+            "Could not create %d orders at once, creating them one by one", len(orders)
+        )
+
+    results = []
+    for order in orders:
+        try:
+            with env.cr.savepoint():
+                new_order = insert_idempotent_orders(env, session, [order])
+            results.append(OrderResult(order_reference=new_order.pos_reference))
+        except HTTPException as e:
+            key = order.idempotency_key
+            reference = None
+            if e.status_code == 409:
+                reference = get_committed_order_references(env, [key]).get(key)
+            if reference:
+                results.append(OrderResult(order_reference=reference))
+            else:
+                results.append(OrderResult(error=f"Failed to create order: {e.detail}"))
+        except OperationalError:
+            raise
+        except Exception as e:
+            _logger.exception("Could not create an order of the batch")
+            results.append(OrderResult(error=f"Failed to create order: {e}"))
+    return results
+
+
+@order_router.get(
+    "/orders",
+    status_code=200,
+    response_model=list[OrderInfo],
+    response_model_exclude_unset=True,
+    dependencies=[Depends(list_orders_limiter)],
+)
+@orm_route
+def list_orders(
+    env: Annotated[Environment, Depends(odoo_env)],
+    session_id: Annotated[int | None, Query(ge=1)] = None,
+    limit: Annotated[
+        int, Query(ge=1, le=MAX_ORDER_PAGE_SIZE)
+    ] = DEFAULT_ORDER_PAGE_SIZE,
+    cursor: str | None = None,
+    selected_fields: Annotated[str | None, Query(alias="fields")] = None,
+    lines: bool = True,
+) -> list[OrderInfo]:
+    """
+    List the orders of a session, oldest first.
+
+    The orders are paginated on their date and ID, so every page is read with one index
+    range scan whatever its position. The cursor of the next page is sent in the
+    `X-Next-Cursor` header, which is missing on the last page. The lines of all the
+    orders of a page are read at once.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+    - session_id: int | None - The session to list, the current session when omitted.
+    - limit: int - The page size.
+    - cursor: str | None - The cursor returned with the previous page, omitted for the
+      first one.
+    - selected_fields: str | None - A comma-separated list of the order fields to
+      return.
+    - lines: bool - Whether to embed the order lines.
+
+    Returns:
+    - list[OrderInfo]: The orders of the page.
+
+    Raises:
+    - HTTPException: If there is no open session, or if the cursor or a field is
+      invalid.
+    """
+    if session_id is None:
+        session_id = get_session(env).id
+    order_fields = parse_order_fields(selected_fields)
+    orders = search_session_orders(
+        env, session_id, decode_order_cursor(cursor) if cursor else None, limit + 1
+    )
+    headers = {}
+    if len(orders) > limit:
+        orders = orders[:limit]
+        headers["X-Next-Cursor"] = encode_order_cursor(orders[-1])
+    infos = read_orders(orders, order_fields, lines)
+    return PosJSONResponse(
+        content=OrderInfoList.dump_json(infos, exclude_unset=True), headers=headers
+    )
+
+
+def search_session_orders(env, session_id, after, limit):
+    """
+    Searches the orders of a session, oldest first, following a position in the listing.
+
+    The position is compared as the row `(date_order, id)`, which PostgreSQL matches as
+    a single range of the `pos_order_session_date_order_id_idx` index, unlike the
+    equivalent OR of an ORM domain.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - session_id (int): The ID of the session.
+    - after (tuple[datetime, int] | None): The date and ID of the last order already
+      listed, or None to start from the first order.
+    - limit (int): The maximum number of orders to return.
+
+    Returns:
+    - pos.order: The orders found.
+    """
+    Order = env["pos.order"].sudo()
+    Order.flush_model(["session_id", "date_order"])
+    query = "SELECT id FROM pos_order WHERE session_id = %s"
+    params = [session_id]
+    if after:
+        query += " AND (date_order, id) > (%s, %s)"
+        params += after
+    env.cr.execute(query + " ORDER BY date_order, id LIMIT %s", params + [limit])
+    return Order.browse([row[0] for row in env.cr.fetchall()])
+
+
+def parse_order_fields(selected_fields) -> list[str]:
+    """
+    Parses the `fields` selector of the order listing.
+
+    Parameters:
+    - selected_fields (str | None): A comma-separated list of field names, or None for
+      all.
+
+    Returns:
+    - list[str]: The order fields to read.
+
+    Raises:
+    - HTTPException(400): If a field cannot be selected.
+    """
+    if not selected_fields:
+        return ORDER_INFO_FIELDS
+    names = [name.strip() for name in selected_fields.split(",") if name.strip()]
+    unknown = set(names) - set(ORDER_INFO_FIELDS) - {"id"}
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown order fields: {', '.join(sorted(unknown))}",
+        )
+    return [name for name in names if name != "id"]
+
+
+def encode_order_cursor(order) -> str:
+    """
+    Builds an opaque pagination cursor from the last order of a page.
+    """
+    date_order = fields.Datetime.to_string(order.date_order)
+    payload = json.dumps({"d": date_order, "i": order.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_order_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Extracts the date and ID of an order from a cursor built by `encode_order_cursor`.
+
+    Raises:
+    - HTTPException(400): If the cursor is malformed.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return fields.Datetime.to_datetime(payload["d"]), int(payload["i"])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+@order_router.get(
+    "/orders/feed",
+    status_code=200,
+    response_model=OrderFeed,
+    dependencies=[Depends(order_feed_limiter)],
+)
+async def get_order_feed(
+    env: Annotated[Environment, Depends(odoo_env)],
+    after_id: Annotated[int, Query(ge=0)] = 0,
+    timeout: Annotated[float, Query(ge=0, le=MAX_FEED_TIMEOUT)] = DEFAULT_FEED_TIMEOUT,
+) -> OrderFeed:
+    """
+    Long-poll the orders of the current session.
+
+    Orders of the current session with an ID greater than `after_id` are returned at
+    once if there are any. Otherwise the request waits, up to `timeout` seconds, for new
+    orders to be committed. The wait relies on PostgreSQL notifications sent when orders
+    are created, so it does not query the database until there is something to read.
+    Clients should call again with the returned `last_id`.
+
+    The request transaction is committed after reading the notification version and
+    again before waiting, so the orders are always read in a transaction started after
+    the version was read, which sees every order notified since, and the connection does
+    not stay idle in transaction while waiting. A waiting request still holds its
+    worker: with prefork workers, this route should be sent by the reverse proxy to the
+    gevent worker (`--gevent-port`, 8072 by default), which serves many waiting requests
+    at once. The number of waiting requests is capped in each worker by the
+    `order_feed` admission limiter, over which requests are rejected with a 503 error.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+    - after_id: int - The `last_id` of the previous response, 0 for the first call.
+    - timeout: float - The maximum number of seconds to wait for new orders.
+
+    Returns:
+    - OrderFeed: The new orders with their lines, and the ID to resume from.
+    """
+    session = await run_orm(get_session, env)
+    dbname = env.cr.dbname
+    version = await anyio.to_thread.run_sync(order_feed.version, dbname, session.id)
+    # The transaction snapshot was taken by the first query of the request, so orders
+    # notified since then are only seen by reading in a new transaction.
+    await run_orm(env.cr.commit)
+    feed = await run_orm(read_order_feed, env, session.id, after_id)
+    if feed.orders or not timeout:
+        return json_response(feed)
+    await run_orm(env.cr.commit)
+    notified = await anyio.to_thread.run_sync(
+        order_feed.wait, dbname, session.id, version, timeout
+    )
+    if notified:
+        feed = await run_orm(read_order_feed, env, session.id, after_id)
+    return json_response(feed)
+
+
+def read_order_feed(env, session_id, after_id) -> OrderFeed:
+    """
+    Reads the orders of a session created after a given order.
+
+    Parameters:
+    - env (dict): The environment dictionary containing session information and methods.
+    - session_id (int): The ID of the session.
+    - after_id (int): Only orders with a greater ID are read.
+
+    Returns:
+    - OrderFeed: At most `MAX_FEED_ORDERS` orders by ascending ID, and the ID to resume
+      from.
+    """
+    orders = (
         env["pos.order"]
         .sudo()
-        .create(
-            [
-                {
-                    "company_id": pos_info["company_id"],
-                    "pricelist_id": pos_info["pricelist_id"],
-                    "session_id": session.id,
-                    "name": sequence,
-                    "pos_reference": "Pedido " + ref,
-                    "amount_tax": 0.00,
-                    "amount_total": order.total,
-                    "amount_paid": order.total,
-                    "amount_return": 0.00,
-                    "date_order": order.date_order,
-                    "create_date": current_datetime,
-                    "write_date": current_datetime,
-                    "client_phone": order.client_phone,
-                    "notes": order.notes,
-                }
-            ]
+        .search(
+            [("session_id", "=", session_id), ("id", ">", after_id)],
+            order="id",
+            limit=MAX_FEED_ORDERS,
+        )
+    )
+    last_id = orders[-1].id if orders else after_id
+    return OrderFeed(orders=read_orders(orders), last_id=last_id)
+
+
+def read_orders(
+    orders, order_fields=ORDER_INFO_FIELDS, with_lines=True
+) -> list[OrderInfo]:
+    """
+    Reads orders, and optionally all their lines at once, into OrderInfo objects.
+
+    Only the fields read are set on the objects, so that serializing them with
+    `exclude_unset` leaves out the fields that were not selected.
+
+    Parameters:
+    - orders (recordset): The 'pos.order' records to read.
+    - order_fields (list[str]): The order fields to read, besides the ID.
+    - with_lines (bool): Whether to embed the order lines.
+
+    Returns:
+    - list[OrderInfo]: One OrderInfo object per order, in the order of `orders`.
+    """
+
+    def clean(values):
+        return {
+            name: None if value is False else value for name, value in values.items()
+        }
+
+    lines_by_order = {}
+    if with_lines:
+        for line in orders.lines.read(["order_id"] + ORDER_LINE_INFO_FIELDS, None):
+            order_id = line.pop("order_id")
+            lines_by_order.setdefault(order_id, []).append(OrderLineInfo(**clean(line)))
+    infos = []
+    for order in orders.read(order_fields or ["id"], None):
+        if with_lines:
+            order["lines"] = lines_by_order.get(order["id"], [])
+        infos.append(OrderInfo(**clean(order)))
+    return infos
+
+
+@order_router.get("/orders/{ticket}", status_code=200, response_model=OrderTicket)
+@orm_route
+def get_order_ticket(
+    env: Annotated[Environment, Depends(odoo_env)], ticket: str
+) -> OrderTicket:
+    """
+    Get the status of an order created in async mode.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+    - ticket: str - The ticket returned when the order was accepted.
+
+    Returns:
+    - OrderTicket: The state of the order, with its reference once created or the error
+      if it failed.
+
+    Raises:
+    - HTTPException(404) - If the ticket is unknown.
+    """
+    staging = env["pos.order.staging"]._get_by_ticket(ticket)
+    if not staging:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return OrderTicket(
+        ticket=staging.ticket,
+        state=staging.state,
+        order_reference=staging.order_reference or None,
+        error=staging.error or None,
+    )
+
+
+def get_order_references(env, idempotency_keys) -> dict:
+    """
+    Looks up the orders already created under some idempotency keys, in one indexed
+    query.
+
+    Parameters:
+    - env (dict): The environment dictionary containing session information and methods.
+    - idempotency_keys (list[str]): The idempotency keys.
+
+    Returns:
+    - dict: The order references by idempotency key, for the keys already used.
+    """
+    if not idempotency_keys:
+        return {}
+    return env["pos.order.idempotency.key"]._get_order_references(idempotency_keys)
+
+
+def get_committed_order_references(env, idempotency_keys) -> dict:
+    """
+    Looks up the orders already created under some idempotency keys, in a new
+    transaction.
+
+    Unlike the request transaction, it sees the orders committed after the request
+    started, such as the original of a retried order whose key could not be claimed
+    because it was being committed meanwhile.
+
+    Parameters:
+    - env (dict): The environment dictionary containing session information and methods.
+    - idempotency_keys (list[str]): The idempotency keys.
+
+    Returns:
+    - dict: The order references by idempotency key, for the keys already used.
+    """
+    if not idempotency_keys:
+        return {}
+    with env.registry.cursor() as cr:
+        return get_order_references(env(cr=cr), idempotency_keys)
+
+
+def insert_idempotent_orders(env, session, orders):
+    """
+    Inserts orders and their lines, recording the idempotency keys they were created
+    under. The order feed is notified of the new orders once they are committed.
+
+    The keys are claimed before creating anything, so two concurrent requests with the
+    same key cannot both create the order. This should run in a savepoint, so that the
+    claims are released if the creation fails.
+
+    Parameters:
+    - env (dict): The environment dictionary containing session information and methods.
+    - session(Session): The current open or opening control session from the
+      environment.
+    - orders (list[Order]): The order objects containing the order details.
+
+    Returns:
+    - recordset: The newly created 'pos.order' records, in the order of `orders`.
+
+    Raises:
+    - HTTPException(409): If one of the idempotency keys is already claimed.
+    """
+    Keys = env["pos.order.idempotency.key"]
+    keys = [order.idempotency_key for order in orders if order.idempotency_key]
+    if keys and not Keys._claim(keys):
+        raise HTTPException(
+            status_code=409, detail="An order with this idempotency key already exists"
         )
+    new_orders = insert_orders(env, session, orders)
+    insert_orders_lines(env, list(zip(orders, new_orders, strict=True)))
+    notify_orders(env, session.id, new_orders.ids)
+    Keys._attach_orders(
+        [
+            (order.idempotency_key, new_order)
+            for order, new_order in zip(orders, new_orders, strict=True)
+            if order.idempotency_key
+        ]
     )
+    return new_orders
+
+
+def insert_order(env, session, order):
+    """
+    Inserts an order into the Point of Sale (POS) system.
+
+    This function takes in the environment dictionary and an order object as parameters,
+    and delegates to the 'insert_orders' function, which performs the following steps:
+
+    1. Reserves the sequence number of the order using the 'reserve_sequence_numbers'
+       function, and its name from the 'pos.order.pruebas' sequence.
+    2. Retrieves the Point of Sale (POS) information for the session using the
+       'get_pos_info' function.
+    3. Prepares the values of the order using the 'prepare_order_vals' function.
+    4. Creates a new order in the POS system using the 'pos.order' model and the
+       provided data.
+
+    Parameters:
+    - env (dict): The environment dictionary containing session information and methods.
+    - session(Session): The current open or opening control session from the
+      environment.
+    - order (Order): The order object containing the order details.
+
+    Returns:
+    - recordset: The newly created 'pos.order' record.
+    """
+    return insert_orders(env, session, [order])
+
+
+def insert_orders(env, session, orders):
+    """
+    Inserts several orders into the Point of Sale (POS) system with a single create.
+
+    The session and POS configuration are resolved once for all the orders, whose
+    sequence numbers, and names from the 'pos.order.pruebas' sequence, are each reserved
+    in one operation.
+
+    Parameters:
+    - env (dict): The environment dictionary containing session information and methods.
+    - session(Session): The current open or opening control session from the
+      environment.
+    - orders (list[Order]): The order objects containing the order details.
+
+    Returns:
+    - recordset: The newly created 'pos.order' records, in the order of `orders`.
+    """
+    numbers, login_number = reserve_sequence_numbers(env, session, len(orders))
+    names = env["ir.sequence"]._next_block_by_code("pos.order.pruebas", len(orders))
+    pos_info = get_pos_info(env, session.config_id)
+    vals_list = [
+        prepare_order_vals(env, session, pos_info, order, login_number, number, name)
+        for order, number, name in zip(orders, numbers, names, strict=True)
+    ]
+    return env["pos.order"].sudo().create(vals_list)
+
+
+def prepare_order_vals(
+    env, session, pos_info, order, login_number, sequence_number, name
+) -> dict:
+    """
+    Prepares the values to create a 'pos.order' record from an order.
+
+    The order name is reserved by the caller from the 'pos.order.pruebas' sequence, and
+    its reference is generated by the '_generate_unique_ref' function. The session login
+    number and the order sequence number are also stored as integer columns, so the
+    reference never has to be parsed.
+
+    Parameters:
+    - env (dict): The environment dictionary containing session information and methods.
+    - session(Session): The session the order belongs to.
+    - pos_info (dict): The POS configuration, as returned by 'get_pos_info'.
+    - order (Order): The order object containing the order details.
+    - login_number (int): The login number of the session.
+    - sequence_number (int): The sequence number of the order in the session.
+    - name (str): The name of the order.
+
+    Returns:
+    - dict: The values of the new order.
+    """
+    current_datetime = get_formated_datetime()
+    ref = _generate_unique_ref(session.id, login_number, sequence_number)
+    return {
+        "company_id": pos_info["company_id"],
+        "pricelist_id": pos_info["pricelist_id"],
+        "session_id": session.id,
+        "name": name,
+        "pos_reference": "Pedido " + ref,
+        "amount_tax": 0.00,
+        "amount_total": order.total,
+        "amount_paid": order.total,
+        "amount_return": 0.00,
+        "date_order": order.date_order,
+        "create_date": current_datetime,
+        "write_date": current_datetime,
+        "client_phone": order.client_phone,
+        "notes": order.notes,
+        "app_login_number": login_number,
+        "app_sequence_number": sequence_number,
+    }
     
 
 def insert_lines(env, order_data, new_order):
     """
     Inserts order lines into the Point of Sale (POS) system.
 
-    This function takes in the environment dictionary, order data, and the newly created order as parameters. 
-    It performs the following steps:
-
-    1. Iterates over each product in the order data.
-    2. Generates a unique sequence number for each order line using the 'ir.sequence' model.
-    3. Creates a new order line in the POS system using the 'pos.order.line' model and the provided data.
+    This function takes in the environment dictionary, order data, and the newly created
+    order as parameters. It delegates to 'insert_orders_lines', so that the names of all
+    the lines are reserved in one sequence operation and all the lines are created with
+    a single create.
 
     Parameters:
     - env (dict): The environment dictionary containing session information and methods.
@@ -174,53 +807,73 @@ def insert_lines(env, order_data, new_order):
     - HTTPException(400): If the order line creation fails.
 
     """
-    for line in order_data.products:
-        sequence_number = env["ir.sequence"].next_by_code("pos.order.line.pruebas")
-        
-        order_line = {
-                "product_id": line.product_id,
-                "order_id": new_order.id,
-                "name": sequence_number,
-                "full_product_name": line.name,
-                "price_unit": line.price_unit,
-                "qty": line.qty,
-                "price_subtotal": line.price_subtotal,
-                "price_subtotal_incl": line.price_subtotal_incl,
-                "create_date": new_order.create_date,
-                "write_date": new_order.write_date,
-            }
-        
-        if not env["pos.order.line"].create([order_line]):
-            raise HTTPException(status_code=400, detail=f"Failed to insert order line")
+    insert_orders_lines(env, [(order_data, new_order)])
+
+
+def insert_orders_lines(env, orders):
+    """
+    Inserts the lines of several orders into the Point of Sale (POS) system.
+
+    It performs the following steps:
+
+    1. Reserves one name per line from the 'pos.order.line.pruebas' sequence in a
+       single operation.
+    2. Prepares the values of every line of every order.
+    3. Creates all the lines with a single create on the 'pos.order.line' model.
 
-def _generate_unique_ref(session):
+    The number of queries therefore does not grow with the number of lines.
+
+    Parameters:
+    - env (dict): The environment dictionary containing session information and methods.
+    - orders (list[tuple[Order, recordset]]): The order data along with the created
+      'pos.order' record.
+
+    Raises:
+    - HTTPException(400): If the order line creation fails.
+    """
+    count = sum(len(order_data.products) for order_data, _new_order in orders)
+    Sequence = env["ir.sequence"]
+    names = iter(Sequence._next_block_by_code("pos.order.line.pruebas", count))
+    order_lines = [
+        {
+            "product_id": line.product_id,
+            "order_id": new_order.id,
+            "name": next(names),
+            "full_product_name": line.name,
+            "price_unit": line.price_unit,
+            "qty": line.qty,
+            "price_subtotal": line.price_subtotal,
+            "price_subtotal_incl": line.price_subtotal_incl,
+            "create_date": new_order.create_date,
+            "write_date": new_order.write_date,
+        }
+        for order_data, new_order in orders
+        for line in order_data.products
+    ]
+
+    if len(env["pos.order.line"].create(order_lines)) != len(order_lines):
+        raise HTTPException(status_code=400, detail="Failed to insert order line")
+
+
+def _generate_unique_ref(session_id, login_number, sequence_number):
     """
     Generates a unique reference for an order.
 
-    This function takes in a session object as a parameter and generates a unique reference for an order. 
-    The reference is generated by concatenating the session ID, login number, and the incremented sequence number. The session ID 
-    is zero-padded to a size of 5, the login number is zero-padded to a size of 3, and the sequence number is incremented by 1 
-    and zero-padded to a size of 4.
+    The reference is generated by concatenating the session ID, login number, and the
+    sequence number of the order. The session ID is zero-padded to a size of 5, the
+    login number is zero-padded to a size of 3, and the sequence number is zero-padded
+    to a size of 4.
 
     Parameters:
-    - session: The session object containing the session ID, login number, and sequence number.
+    - session_id (int): The ID of the session.
+    - login_number (int): The login number of the session.
+    - sequence_number (int): The sequence number of the order, as reserved by
+      'reserve_sequence_numbers'.
 
     Returns:
     - str: The unique reference for the order.
     """
-    def zero_pad(num, size):
-        s: str = str(num)
-        while len(s) < size:
-            s = "0" + s
-        return s
-
-    return (
-        zero_pad(session.id, 5)
-        + "-"
-        + zero_pad(session.login_number, 3)
-        + "-"
-        + zero_pad(session.sequence_number + 1, 4)
-    )
+    return f"{session_id:05d}-{login_number:03d}-{sequence_number:04d}"
 
 
 def get_pos_info(env, pos_id: str):
@@ -232,6 +885,8 @@ def get_pos_info(env, pos_id: str):
     1. Searches for a POS configuration record in the environment using the provided POS ID.
     2. Reads specific fields from the found POS configuration record, including the pricelist ID and company ID.
 
+    The result is cached in every worker until the POS configuration is modified.
+
     Parameters:
     - env (dict): The environment dictionary containing session information and methods.
     - pos_id (str): The ID of the POS configuration to retrieve information for.
@@ -239,62 +894,28 @@ def get_pos_info(env, pos_id: str):
     Returns:
     - dict: A dictionary containing the pricelist ID and company ID of the POS configuration.
     """
-    return (
-        env["pos.config"]
-        .sudo()
-        .search([("id", "=", pos_id)], limit=1)
-        .read(["pricelist_id", "company_id"], None)[0]
-    )
+    return dict(env["pos.config"]._get_app_pos_info(int(pos_id)))
 
 
-def calculate_sequence_number(env, current_session) -> int:
+def reserve_sequence_numbers(env, session, count=1):
     """
-    Calculate the sequence number for a new order.
+    Reserves the sequence numbers of new orders in a session.
 
-    This function takes in the environment dictionary and the current session as parameters. It performs the following steps:
-
-    1. Retrieves the most recent order's POS reference from the 'pos.order' model.
-    2. Parses the POS reference to extract the session ID, login number, and sequence number.
-    3. Compares the extracted session ID and login number with the current session's ID and login number.
-    4. If the session ID and login number match, returns the sequence number.
-    5. If the session ID or login number does not match, returns 0, reseting the sequence.
+    The numbers come from a per-session PostgreSQL sequence, so concurrent requests
+    never get the same number, nor wait for each other, whatever the size of the order
+    history.
 
     Parameters:
     - env (dict): The environment dictionary containing session information and methods.
-    - current_session: The current session object containing the session ID and login number.
+    - session (Session): The session the orders belong to.
+    - count (int): The number of orders.
 
     Returns:
-    - int: The calculated sequence number for a new order.
+    - tuple[list[int], int]: The reserved sequence numbers in ascending order, and the
+      login number of the session.
     """
-    ref = (
-        env["pos.order"]
-        .sudo()
-        .search([], order="create_date desc", limit=1)
-        .read(["pos_reference"], None)[0]["pos_reference"]
-    )
-
-    if ref:
-        session_id = int(
-            "".join(
-                number
-                for number in list(ref.split("-")[0].split(" ")[1])
-                if number != "0"
-            )
-        )
-        login_number = int(
-            "".join(number for number in list(ref.split("-")[1]) if number != "0")
-        )
-        seq = int(
-            "".join(number for number in list(ref.split("-")[2]) if number != "0")
-        )
-
-        if (
-            current_session.id != session_id
-            or current_session.login_number != login_number
-        ):
-            return 0
-        else:
-            return seq
+    pos_session = env["pos.session"].sudo().browse(session.id)
+    return pos_session._reserve_app_sequence_numbers(count)
 
 
 def get_formated_datetime():
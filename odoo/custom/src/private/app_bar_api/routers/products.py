@@ -1,20 +1,151 @@
-from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import binascii
+import hashlib
+import json
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+from typing import Annotated, NamedTuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from odoo import fields
 from odoo.api import Environment
+from odoo.tools import file_open
+from odoo.tools.mimetypes import guess_mimetype
+
 from odoo.addons.fastapi.dependencies import odoo_env
-from ..schemas.product import Product, Product2
-import wdb
 
-product_router = APIRouter(tags=["products"], responses={404: {"message": "Not Found"}})
+from ..models.product_tombstone import TOMBSTONE_RETENTION_DAYS
+from ..schemas.product import (
+    Product,
+    Product2,
+    Product2List,
+    ProductChanges,
+    ProductList,
+)
+from ..utils.cache import PRICE_CACHE_TTL, catalog_cache, catalog_key, price_cache
+from ..utils.compression import compress, negotiate_encoding
+from ..utils.concurrency import RouteLimiter, orm_route
+from ..utils.replica import read_only_env
+from ..utils.responses import PosJSONResponse, json_response
+from .orders import get_pos_info, get_session
+
+product_router = APIRouter(
+    tags=["products"],
+    responses={404: {"message": "Not Found"}},
+    default_response_class=PosJSONResponse,
+)
+
+POS_PRODUCTS_DOMAIN = [("available_in_pos", "=", True)]
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 200
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MIN_SEARCH_LENGTH = 2
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+TRIGRAM_DATABASES = {}
+SQL_FAST_PATH_PARAM = "app_bar_api.catalog_sql_fast_path"
+IMAGE_SIZES = (128, 256, 512)
+IMAGE_PLACEHOLDER_URL = "/products/image/placeholder"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Number of leading characters of the image checksum used as the version in image URLs.
+IMAGE_VERSION_LENGTH = 16
+# Changes written by transactions still running when a token was issued carry an earlier
+# write_date than the token, so each sync looks back this far to pick them up.
+SYNC_TOKEN_OVERLAP = timedelta(minutes=2)
 
+# The limits are shared by all the workers of the database. Revalidations answered with
+# a 304 need no slot.
+products_limiter = RouteLimiter(
+    "products",
+    32,
+    queue_size=64,
+    exempt=lambda env, request: is_catalog_revalidation(env, request),
+)
+products2_limiter = RouteLimiter(
+    "products2",
+    32,
+    queue_size=64,
+    exempt=lambda env, request: is_catalog_revalidation(env, request, streamable=True),
+)
+search_limiter = RouteLimiter("search_products", 32, queue_size=64)
 
-@product_router.get("/products",response_model=List[Product],response_model_exclude_unset=True,status_code=200,)
-async def get_products(env: Annotated[Environment, Depends(odoo_env)],) -> List[Product]:
+
+class CatalogVersion(NamedTuple):
+    """
+    Identifies one state of the POS catalog as seen by the current user.
+
+    Attributes:
+    - etag (str): A strong entity tag, quoted as sent in the `ETag` header.
+    - last_modified (datetime | None): The most recent `write_date` of the catalog, in
+      UTC.
+    """
+
+    etag: str
+    last_modified: datetime | None
+
+    def headers(self) -> dict:
+        """
+        Returns the validator headers to send along with a catalog response.
+        """
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def variant(self, *parts) -> "CatalogVersion":
+        """
+        Returns the version of a subset of the catalog, such as one page, identified by
+        `parts`.
+        """
+        key = "|".join(str(part) for part in (self.etag,) + parts)
+        return self._replace(etag=f'"{hashlib.sha1(key.encode()).hexdigest()}"')
+
+
+@product_router.get(
+    "/products",
+    response_model=list[Product],
+    response_model_exclude_unset=True,
+    status_code=200,
+    dependencies=[Depends(products_limiter)],
+)
+@orm_route
+def get_products(
+    env: Annotated[Environment, Depends(odoo_env)],
+    request: Request,
+    limit: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    after_id: Annotated[int, Query(ge=0)] = 0,
+) -> list[Product]:
     """
     Get a list of products.
 
+    The response carries `ETag` and `Last-Modified` validators. When the client sends
+    `If-None-Match` or `If-Modified-Since` matching the current catalog version, an
+    empty 304 response is returned without reading the products.
+
+    While a POS session is open, `pricelist_price` holds the price of each product in
+    the pricelist of the session, which orders are created with. Only the `ETag`
+    validator is sent then, since a pricelist switch does not show in the modification
+    date.
+
+    When `limit` is given, products are returned by ascending ID, at most `limit` at a
+    time, starting after `after_id`. The cursor of the next page is sent in the
+    `X-Next-Cursor` header, which is missing on the last page. Without `limit`, all the
+    products after `after_id` are returned.
+
+    The catalog is read from the read replica when one is configured and up to date.
+
     Parameters:
     - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+    - request: Request - The incoming request, used for the conditional headers.
+    - limit: int | None - The page size. The rest of the catalog is returned when
+      omitted.
+    - after_id: int - The cursor returned with the previous page, 0 for the first one.
 
     Returns:
     - list[Product]: A list of products.
@@ -23,88 +154,855 @@ async def get_products(env: Annotated[Environment, Depends(odoo_env)],) -> List[
     - HTTPException: If no products are available.
 
     """
-    return search_products(env)
+    with read_only_env(env) as read_env:
+        return serve_catalog(
+            read_env, request, "products", search_products, ProductList, limit, after_id
+        )
+
+
+def serve_catalog(
+    env, request, kind, loader, adapter, limit=None, after_id=0, streamer=None
+):
+    """
+    Answers a catalog request, shared by `/products` and `/products2`.
+
+    Conditional requests are checked against the catalog version first. Clients
+    accepting NDJSON get a streamed response when the catalog supports it. Otherwise,
+    whole catalogs are served from the per-worker cache, while pages, and the end of the
+    catalog after `after_id` when no `limit` is given, are read with a keyset query. In
+    all cases the catalog is serialized once through `adapter`, skipping the validation
+    FastAPI would otherwise run again against the `response_model`.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - request: Request - The incoming request.
+    - kind (str): The name of the catalog, used as cache key.
+    - loader: The function reading the catalog, `search_products` or `search_products2`.
+    - adapter: TypeAdapter - The adapter serializing the catalog, such as `ProductList`.
+    - limit (int | None): The page size, or None for the whole catalog.
+    - after_id (int): The ID after which the page starts.
+    - streamer: The generator yielding the catalog as NDJSON lines, such as
+      `stream_products2`.
+
+    Returns:
+    - Response: The serialized catalog, or a streamed or empty 304 response.
+    """
+    accept = request.headers.get("accept", "")
+    stream = streamer is not None and NDJSON_MEDIA_TYPE in accept
+    catalog_version = get_catalog_version(env)
+    pricelist = get_pos_pricelist(env)
+    pricelist_version = get_pricelist_version(env, pricelist)
+    version = get_request_version(
+        catalog_version, pricelist, pricelist_version, limit, after_id, stream
+    )
+    if is_not_modified(request, version):
+        return Response(status_code=304, headers=version.headers())
+
+    def get_prices():
+        return get_pricelist_prices(env, pricelist, pricelist_version, catalog_version)
+
+    if stream:
+        return StreamingResponse(
+            streamer(env, limit=limit, after_id=after_id, prices=get_prices()),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=version.headers(),
+        )
+
+    def read_catalog():
+        headers = {}
+        if not limit and not after_id:
+            catalog = get_cached_catalog(env, kind, catalog_version, loader)
+        else:
+            catalog = loader(env, limit=limit, after_id=after_id)
+            if len(catalog) == limit:
+                headers["X-Next-Cursor"] = str(catalog[-1].id)
+        return apply_prices(catalog, get_prices()), headers
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding:
+        ttl = PRICE_CACHE_TTL if pricelist else None
+        return get_compressed_catalog(
+            env, version, encoding, adapter, read_catalog, ttl
+        )
+    catalog, headers = read_catalog()
+    return json_response(catalog, adapter, headers={**version.headers(), **headers})
+
+
+def get_request_version(
+    catalog_version, pricelist, pricelist_version, limit=None, after_id=0, stream=False
+) -> CatalogVersion:
+    """
+    Returns the version of the catalog response to a request, validated by the
+    conditional headers.
+
+    Parameters:
+    - catalog_version: CatalogVersion - The version of the whole catalog.
+    - pricelist: The pricelist of the current session, or an empty recordset.
+    - pricelist_version (str): The version of the prices, from `get_pricelist_version`.
+    - limit (int | None): The page size, or None for the whole catalog.
+    - after_id (int): The ID after which the page starts.
+    - stream (bool): Whether the catalog is streamed as NDJSON.
+
+    Returns:
+    - CatalogVersion: The version of the requested catalog or page.
+    """
+    version = catalog_version
+    if limit or after_id or stream or pricelist:
+        version = version.variant(limit, after_id, stream, pricelist_version)
+    if pricelist:
+        # Switching the session to another pricelist changes the prices without any
+        # later write date, so priced catalogs are only validated through their entity
+        # tag.
+        version = version._replace(last_modified=None)
+    return version
+
+
+def is_catalog_revalidation(env, request, streamable=False) -> bool:
+    """
+    Tells whether a catalog request will be answered with a 304, before the route runs,
+    so that it can be admitted without a slot.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - request: Request - The incoming request.
+    - streamable (bool): Whether the catalog can be streamed as NDJSON.
+
+    Returns:
+    - bool: True when the conditional headers match the current catalog version.
+    """
+    headers = request.headers
+    if "if-none-match" not in headers and "if-modified-since" not in headers:
+        return False
+    try:
+        limit = int(request.query_params.get("limit") or 0) or None
+        after_id = int(request.query_params.get("after_id") or 0)
+    except ValueError:
+        return False
+    stream = streamable and NDJSON_MEDIA_TYPE in headers.get("accept", "")
+    catalog_version = get_catalog_version(env)
+    pricelist = get_pos_pricelist(env)
+    pricelist_version = get_pricelist_version(env, pricelist)
+    version = get_request_version(
+        catalog_version, pricelist, pricelist_version, limit, after_id, stream
+    )
+    return is_not_modified(request, version)
+
+
+def get_compressed_catalog(
+    env, version, encoding, adapter, read_catalog, ttl=None
+) -> Response:
+    """
+    Returns a compressed catalog response, compressing each catalog version only once.
+
+    Compressed bodies are kept in the per-worker catalog cache, keyed by the catalog
+    version and the content coding, together with the headers to send along with them.
+    Bodies holding pricelist prices are given the lifetime of the prices,
+    `PRICE_CACHE_TTL`.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - version: CatalogVersion - The version of the requested catalog or page.
+    - encoding (str): The content coding, as returned by `negotiate_encoding`.
+    - adapter: TypeAdapter - The adapter serializing the catalog.
+    - read_catalog: A callable returning the catalog and its extra headers on a miss.
+    - ttl (float | None): The lifetime of the cached body, that of the cache when None.
+
+    Returns:
+    - Response: The compressed JSON response.
+    """
+    key = (env.cr.dbname, "compressed", version.etag, encoding)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        catalog, headers = read_catalog()
+        entry = (compress(adapter.dump_json(catalog), encoding), headers)
+        catalog_cache.set(key, entry, ttl)
+    body, headers = entry
+    return PosJSONResponse(
+        content=body,
+        headers={
+            **version.headers(),
+            **headers,
+            "Content-Encoding": encoding,
+            "Vary": "Accept-Encoding",
+        },
+    )
+
+
+def get_pos_pricelist(env):
+    """
+    Returns the pricelist orders are currently created with, that of the open POS
+    session.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+
+    Returns:
+    - recordset | None: The 'product.pricelist' record, or None without open session.
+    """
+    try:
+        session = get_session(env)
+    except HTTPException:
+        return None
+    pricelist_id = get_pos_info(env, session.config_id)["pricelist_id"]
+    if not pricelist_id:
+        return None
+    return env["product.pricelist"].sudo().browse(pricelist_id)
+
+
+def get_pricelist_version(env, pricelist) -> str:
+    """
+    Computes a version of a pricelist, which changes whenever the pricelist or its rules
+    do.
+
+    Rules may also come into effect or expire on their dates without being written, so
+    the version of a pricelist with dated rules also changes every `PRICE_CACHE_TTL`
+    seconds.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - pricelist (recordset | None): The 'product.pricelist' record.
+
+    Returns:
+    - str: The version of the pricelist, or an empty string without pricelist.
+    """
+    if not pricelist:
+        return ""
+    items = (
+        env["product.pricelist.item"]
+        .sudo()
+        .read_group(
+            [("pricelist_id", "=", pricelist.id)],
+            ["write_date:max", "id:count", "date_start:max", "date_end:max"],
+            [],
+        )[0]
+    )
+    period = ""
+    if items["date_start"] or items["date_end"]:
+        period = int(time.time() // PRICE_CACHE_TTL)
+    return ":".join(
+        str(part)
+        for part in (
+            pricelist.id,
+            pricelist.write_date,
+            items["write_date"],
+            items["id"],
+            period,
+        )
+    )
+
+
+def get_pricelist_prices(env, pricelist, pricelist_version, catalog_version) -> dict:
+    """
+    Returns the prices of the whole POS catalog in a pricelist, computed in one batch.
+
+    Prices are cached per pricelist and catalog version. Since pricelist rules may
+    depend on the date, entries are kept at most `PRICE_CACHE_TTL` seconds.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - pricelist (recordset | None): The 'product.pricelist' record.
+    - pricelist_version (str): The version of the pricelist, see
+      `get_pricelist_version`.
+    - catalog_version: CatalogVersion - The version of the catalog.
+
+    Returns:
+    - dict: The unit prices by product template ID, empty without pricelist.
+    """
+    if not pricelist:
+        return {}
+    key = (env.cr.dbname, "prices", pricelist_version, catalog_version.etag)
+    prices = price_cache.get(key)
+    if prices is None:
+        prices = pricelist._get_products_price(search_pos_templates(env), 1.0)
+        price_cache.set(key, prices)
+    return prices
+
+
+def apply_prices(catalog, prices):
+    """
+    Returns copies of catalog products with their `pricelist_price` set from `prices`.
+
+    The catalog itself is left untouched, as it may be shared through the catalog cache.
+    """
+    if not prices:
+        return catalog
+    return [
+        product.model_copy(update={"pricelist_price": prices.get(product.id)})
+        for product in catalog
+    ]
 
 
-def search_products(env) -> List[Product]:
+def search_pos_templates(env, limit=None, after_id=0):
+    """
+    Searches the product templates available in the point of sale.
+
+    Without `limit`, all of them are returned in the default model order. Otherwise they
+    are ordered by ID and filtered with an `id > after_id` predicate, so that each page
+    is an indexed range scan whatever its position in the catalog.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - limit (int | None): The maximum number of templates to return.
+    - after_id (int): Only templates with a greater ID are returned.
+
+    Returns:
+    - recordset: The matching 'product.template' records.
+    """
+    domain = list(POS_PRODUCTS_DOMAIN)
+    if after_id:
+        domain.append(("id", ">", after_id))
+    if limit:
+        return env["product.template"].search(domain, order="id", limit=limit)
+    return env["product.template"].search(domain)
+
+
+def get_catalog_version(env) -> CatalogVersion:
+    """
+    Computes the current version of the POS catalog.
+
+    The version is derived from the latest `write_date` and the record count of the
+    POS-available product templates, plus the latest `write_date` of the product
+    categories (their names are part of `/products2`). Both values come from aggregate
+    queries, so record rules still apply and no product is read. The database, companies
+    and language are mixed into the tag because they change the served content.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+
+    Returns:
+    - CatalogVersion: The entity tag and last modification date of the catalog.
+    """
+    products = env["product.template"].read_group(
+        POS_PRODUCTS_DOMAIN, ["write_date:max", "id:count"], []
+    )[0]
+    categories = env["product.category"].read_group([], ["write_date:max"], [])[0]
+    dates = [
+        date for date in (products["write_date"], categories["write_date"]) if date
+    ]
+    last_modified = None
+    if dates:
+        last_modified = max(dates).replace(tzinfo=timezone.utc, microsecond=0)
+    key = "|".join(
+        str(part)
+        for part in (
+            env.cr.dbname,
+            env.companies.ids,
+            env.lang,
+            products["write_date"],
+            products["id"],
+            categories["write_date"],
+        )
+    )
+    return CatalogVersion(f'"{hashlib.sha1(key.encode()).hexdigest()}"', last_modified)
+
+
+def get_cached_catalog(env, kind: str, version: CatalogVersion, loader):
+    """
+    Returns a catalog from the per-worker cache, building and storing it on a miss.
+
+    Entries are keyed by database, companies and language, and stored along the catalog
+    version they were built for. Model hooks clear them in the worker where the catalog
+    is modified; in the other workers the version comparison makes the stale entry a
+    miss.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - kind (str): The name of the catalog, part of the cache key.
+    - version: CatalogVersion - The current catalog version.
+    - loader: A callable building the catalog from `env`, such as `search_products`.
+
+    Returns:
+    - list: The catalog, as returned by `loader`.
+    """
+    key = catalog_key(env, kind)
+    entry = catalog_cache.get(key)
+    if entry and entry[0] == version.etag:
+        return entry[1]
+    catalog = loader(env)
+    catalog_cache.set(key, (version.etag, catalog))
+    return catalog
+
+
+def is_not_modified(request: Request, version: CatalogVersion) -> bool:
+    """
+    Evaluates the conditional request headers against a catalog version.
+
+    `If-None-Match` takes precedence over `If-Modified-Since`, as required by RFC 9110.
+
+    Parameters:
+    - request: Request - The incoming request.
+    - version: CatalogVersion - The current catalog version.
+
+    Returns:
+    - bool: True when the client copy is still current and a 304 can be sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or version.etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or not version.last_modified:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return version.last_modified <= since
+
+
+def search_products(env, limit=None, after_id=0) -> list[Product]:
     """
     Searches for products in the Odoo environment.
 
     Parameters:
     - env: An instance of the Odoo environment.
+    - limit (int | None): The page size, see `search_pos_templates`.
+    - after_id (int): The page cursor, see `search_pos_templates`.
 
     Returns:
     - A list of Product objects containing the searched products.
 
     Raises:
-    - HTTPException with status code 204 if no products are available.
+    - HTTPException with status code 204 if no products are available. Pages past the
+      end of the catalog are returned empty instead.
 
     Example Usage:
     search_products(env)
     """
-    products = (env["product.template"].search([("available_in_pos", "=", "true")]).read(["id", "name", "categ_id", "list_price"], None))
-    if not products:
+    templates = search_pos_templates(env, limit, after_id)
+    products = templates.read(["id", "name", "categ_id", "list_price"], None)
+    if not products and not after_id:
         raise HTTPException(status_code=204, detail="No products available")
     return [Product.model_validate(product) for product in products]
 
 
-@product_router.get("/products2", response_model=list[Product2], status_code=200)
-async def get_products2(
-    env: Annotated[Environment, Depends(odoo_env)]
+@product_router.get(
+    "/products2",
+    response_model=list[Product2],
+    status_code=200,
+    dependencies=[Depends(products2_limiter)],
+)
+@orm_route
+def get_products2(
+    env: Annotated[Environment, Depends(odoo_env)],
+    request: Request,
+    limit: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    after_id: Annotated[int, Query(ge=0)] = 0,
 ) -> list[Product2]:
     """
 Get a list of products.
 
+Like `/products`, the response carries `ETag` and `Last-Modified` validators, a
+conditional request matching the current catalog version gets an empty 304 response, and
+`limit`/`after_id` page through the catalog by ascending ID, in both JSON and NDJSON.
+
+With `Accept: application/x-ndjson`, products are streamed one JSON object per line,
+read from the database in fixed-size batches so memory use does not grow with the
+catalog.
+
+The catalog is read from the read replica when one is configured and up to date.
+
 Returns:
     list[Product2]: A list of products with the following attributes:
         - id (int): The ID of the product.
         - name (str): The name of the product.
         - categ (str): The category of the product.
         - price (float): The price of the product.
-        - image (bytes): The image of the product.
+        - image_url (str): The versioned URL of the product image, relative to the API
+          root.
         - desc (str): The description of the product.
+        - pricelist_price (float | None): The price in the pricelist of the open POS
+          session.
 
 Raises:
     HTTPException: If no products are available.
 
 """
-    return search_products2(env)
+    with ExitStack() as stack:
+        read_env = stack.enter_context(read_only_env(env))
+        response = serve_catalog(
+            read_env,
+            request,
+            "products2",
+            search_products2,
+            Product2List,
+            limit,
+            after_id,
+            streamer=stream_products2,
+        )
+        if isinstance(response, StreamingResponse):
+            # The replica cursor is read from until the whole catalog is streamed.
+            response.background = BackgroundTask(stack.pop_all().close)
+        return response
 
 
-def search_products2(env) -> List[Product2]:
+def search_products2(env, limit=None, after_id=0) -> list[Product2]:
     """
     Searches for products available in the point of sale system and constructs a list of Product2 objects.
 
     Args:
     env (dict): A dictionary representing the environment context, which includes access to the model 'product.template'.
+    limit (int | None): The page size, see `search_pos_templates`.
+    after_id (int): The page cursor, see `search_pos_templates`.
 
     Returns:
     list[Product2]: A list of Product2 objects, each representing a product available in the point of sale.
 
     Raises:
     HTTPException: If no products are found, an HTTPException with status code 204 is raised indicating no products are available.
+    Pages past the end of the catalog are returned empty instead.
 
     Each Product2 object in the returned list contains the following attributes:
     - id (int): The product's unique identifier.
     - name (str): The name of the product.
     - categ (str): The category of the product.
     - price (float): The list price of the product.
-    - image (str): A URL or data representing the image of the product.
+    - image_url (str): The content-versioned URL of the 512px image of the product, or
+      the shared placeholder URL when the product has no image.
     - desc (str): A description of the product, suitable for sales.
     """
-    result = (env["product.template"].search([("available_in_pos", "=", "true")]).read(["id", "name", "categ_id", "list_price", "image_512", "description_sale"]))
+    if use_sql_fast_path(env):
+        products = search_products2_sql(env, limit, after_id)
+    else:
+        products = read_products2(env, search_pos_templates(env, limit, after_id))
 
-    if not result:
+    if not products and not after_id:
         raise HTTPException(status_code=204, detail="No products available")
-    
-    return [Product2(
-                id=product["id"],
-                name=product["name"],
-                categ=product["categ_id"][1],
-                price=product["list_price"],
-                image=get_image(product),
-                desc= get_description(product)
-            ) for product in result]
+    return products
+
+
+def use_sql_fast_path(env) -> bool:
+    """
+    Tells whether `/products2` is read with `search_products2_sql`, as enabled by the
+    `app_bar_api.catalog_sql_fast_path` system parameter.
+    """
+    return bool(env["ir.config_parameter"].sudo().get_param(SQL_FAST_PATH_PARAM))
+
+
+def pos_templates_subquery(env, after_id=0):
+    """
+    Builds the SQL selecting the IDs of the POS-available templates readable by the
+    user.
+
+    The query is built by the ORM from the same domain as `search_pos_templates`, after
+    checking the access rights, and restricted by the record rules of the current user.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - after_id (int): Only templates with a greater ID are selected.
+
+    Returns:
+    - tuple[str, list]: The SQL subquery and its parameters.
+    """
+    Template = env["product.template"]
+    Template.check_access_rights("read")
+    domain = list(POS_PRODUCTS_DOMAIN)
+    if after_id:
+        domain.append(("id", ">", after_id))
+    query = Template._where_calc(domain)
+    Template._apply_ir_rules(query, "read")
+    return query.subselect('"product_template"."id"')
+
+
+def search_products2_sql(env, limit=None, after_id=0) -> list[Product2]:
+    """
+    Reads the products of `/products2` with a single SQL query.
+
+    The templates are filtered by the same domain as `search_pos_templates`, with the
+    access rights and record rules of the current user applied through the ORM query
+    builder. The translated names and descriptions, category names, prices and image
+    checksums are then fetched in the same statement, which saves the ORM round trips of
+    `read_products2`.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - limit (int | None): The page size, see `search_pos_templates`.
+    - after_id (int): The page cursor, see `search_pos_templates`.
+
+    Returns:
+    - list[Product2]: The products, in the same order as the ORM path.
+    """
+    Template = env["product.template"]
+    ids_query, ids_params = pos_templates_subquery(env, after_id)
+
+    Template.flush_model(
+        ["name", "categ_id", "list_price", "description_sale", "priority"]
+    )
+    env["product.category"].flush_model(["complete_name"])
+    env["ir.attachment"].flush_model(["res_model", "res_field", "res_id", "checksum"])
+
+    order = "t.id" if limit else "t.priority DESC, name, t.id"
+    lang = env.lang or "en_US"
+    env.cr.execute(
+        f"""
+        SELECT t.id,
+               COALESCE(t.name->>%s, t.name->>'en_US') AS name,
+               c.complete_name,
+               t.list_price,
+               COALESCE(t.description_sale->>%s, t.description_sale->>'en_US'),
+               a.checksum
+          FROM product_template t
+          JOIN product_category c ON c.id = t.categ_id
+     LEFT JOIN ir_attachment a ON a.res_model = 'product.template'
+                              AND a.res_field = 'image_512'
+                              AND a.res_id = t.id
+         WHERE t.id IN ({ids_query})
+      ORDER BY {order}
+         LIMIT %s
+        """,
+        [lang, lang, *ids_params, limit],
+    )
+    return [
+        Product2(
+            id=product_id,
+            name=name or "",
+            categ=categ or "",
+            price=price or 0.0,
+            image_url=get_image_url(product_id, checksum),
+            desc=desc or "",
+        )
+        for product_id, name, categ, price, desc, checksum in env.cr.fetchall()
+    ]
+
+
+def stream_products2(env, limit=None, after_id=0, prices=None):
+    """
+    Yields the products of `/products2` as NDJSON lines.
+
+    Templates are read by ascending ID in batches of `STREAM_BATCH_SIZE`, and each batch
+    is evicted from the ORM cache once serialized, so that only one batch is held in
+    memory.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - limit (int | None): The maximum number of products to yield, or None for all of
+      them.
+    - after_id (int): Only products with a greater ID are yielded.
+    - prices (dict | None): The pricelist prices by product ID, see
+      `get_pricelist_prices`.
+
+    Yields:
+    - bytes: One serialized Product2 object followed by a newline.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = STREAM_BATCH_SIZE
+        if remaining is not None:
+            size = min(size, remaining)
+        templates = search_pos_templates(env, size, after_id)
+        for product in apply_prices(read_products2(env, templates), prices):
+            yield product.model_dump_json().encode() + b"\n"
+        if len(templates) < size:
+            return
+        after_id = templates[-1].id
+        if remaining is not None:
+            remaining -= len(templates)
+        templates.invalidate_recordset()
+
+
+def read_products2(env, templates) -> list[Product2]:
+    """
+    Reads product templates into Product2 objects.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - templates (recordset): The 'product.template' records to read.
+
+    Returns:
+    - list[Product2]: One Product2 object per template, in the order of `templates`.
+    """
+    result = templates.read(
+        ["id", "name", "categ_id", "list_price", "description_sale"]
+    )
+    checksums = get_image_checksums(env, [product["id"] for product in result])
+    return [
+        Product2(
+            id=product["id"],
+            name=product["name"],
+            categ=product["categ_id"][1],
+            price=product["list_price"],
+            image_url=get_image_url(product["id"], checksums.get(product["id"])),
+            desc=get_description(product),
+        )
+        for product in result
+    ]
+
+
+@product_router.get(
+    "/products/search",
+    response_model=list[Product2],
+    status_code=200,
+    dependencies=[Depends(search_limiter)],
+)
+@orm_route
+def search_products_by_name(
+    env: Annotated[Environment, Depends(odoo_env)],
+    q: Annotated[str, Query(min_length=MIN_SEARCH_LENGTH)],
+    limit: Annotated[int, Query(ge=1, le=MAX_SEARCH_LIMIT)] = DEFAULT_SEARCH_LIMIT,
+) -> list[Product2]:
+    """
+    Search the POS catalog by product name.
+
+    Names are matched in every language, both on substrings and fuzzily, through the
+    trigram index created by the module. Products whose name in the user language starts
+    with `q` come first, followed by the others by decreasing similarity. Queries
+    shorter than `MIN_SEARCH_LENGTH` characters are refused, so clients can search as
+    the user types.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+    - q: str - The searched text.
+    - limit: int - The maximum number of products to return.
+
+    Returns:
+    - list[Product2]: The matching products, best matches first.
+    """
+    products = read_products2(env, find_products_by_name(env, q, limit))
+    return json_response(products, Product2List)
+
+
+def has_trigram(env) -> bool:
+    """
+    Tells whether the `pg_trgm` extension is installed in the database, checked once per
+    worker.
+    """
+    dbname = env.cr.dbname
+    if dbname not in TRIGRAM_DATABASES:
+        env.cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        TRIGRAM_DATABASES[dbname] = bool(env.cr.rowcount)
+    return TRIGRAM_DATABASES[dbname]
+
+
+def find_products_by_name(env, text, limit):
+    """
+    Finds the POS-available templates whose name matches `text`, ranked by relevance.
+
+    Without the `pg_trgm` extension, this falls back to a case-insensitive substring
+    search in the user language.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - text (str): The searched text.
+    - limit (int): The maximum number of templates to return.
+
+    Returns:
+    - recordset: The matching 'product.template' records, best matches first.
+    """
+    Template = env["product.template"]
+    if not has_trigram(env):
+        domain = POS_PRODUCTS_DOMAIN + [("name", "ilike", text)]
+        return Template.search(domain, limit=limit)
+
+    ids_query, ids_params = pos_templates_subquery(env)
+    Template.flush_model(["name"])
+    lang = env.lang or "en_US"
+    pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    env.cr.execute(
+        f"""
+        SELECT t.id
+          FROM product_template t
+         WHERE t.id IN ({ids_query})
+           AND (jsonb_path_query_array(t.name, '$.*')::text ILIKE %s
+                OR %s <%% jsonb_path_query_array(t.name, '$.*')::text)
+      ORDER BY COALESCE(t.name->>%s, t.name->>'en_US') ILIKE %s DESC,
+               word_similarity(%s, COALESCE(t.name->>%s, t.name->>'en_US')) DESC,
+               t.id
+         LIMIT %s
+        """,
+        [*ids_params, f"%{pattern}%", text, lang, f"{pattern}%", text, lang, limit],
+    )
+    return Template.browse([row[0] for row in env.cr.fetchall()])
+
+
+@product_router.get("/products/changes", response_model=ProductChanges, status_code=200)
+@orm_route
+def get_product_changes(
+    env: Annotated[Environment, Depends(odoo_env)],
+    since: str | None = None,
+) -> ProductChanges:
+    """
+    Get the changes of the catalog since a sync token.
+
+    The first call, without `since`, returns the whole catalog. Every response includes
+    the token to send on the next call, which then returns only the products created or
+    modified since, along with the IDs of the products that were archived, deleted or
+    removed from the point of sale. Clients should drop the `removed` IDs, then upsert
+    the `changed` products. A product may be sent again in the next response; applying
+    it twice is harmless.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+    - since: str | None - The token returned by the previous call.
+
+    Returns:
+    - ProductChanges: The changed products, the removed product IDs and the next token.
+
+    Raises:
+    - HTTPException(400): If the token is malformed.
+    - HTTPException(410): If the token is older than the tombstone retention; the client
+      must then reload the whole catalog.
+    """
+    now = env.cr.now()
+    token = encode_sync_token(now)
+    if not since:
+        templates = search_pos_templates(env)
+        changes = ProductChanges(
+            changed=read_products2(env, templates), removed=[], token=token
+        )
+        return json_response(changes)
+
+    since_date = decode_sync_token(since)
+    if since_date < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise HTTPException(
+            status_code=410, detail="Sync token expired, reload the catalog"
+        )
+    since_date -= SYNC_TOKEN_OVERLAP
+
+    changed_domain = [
+        "|",
+        ("write_date", ">=", since_date),
+        ("categ_id.write_date", ">=", since_date),
+    ]
+    templates = env["product.template"].search(
+        POS_PRODUCTS_DOMAIN + changed_domain, order="id"
+    )
+    tombstones = (
+        env["pos.product.tombstone"]
+        .sudo()
+        .search_read([("date", ">=", since_date)], ["product_tmpl_id"])
+    )
+    removed = {tombstone["product_tmpl_id"] for tombstone in tombstones}
+    removed -= set(templates.ids)
+    changes = ProductChanges(
+        changed=read_products2(env, templates), removed=sorted(removed), token=token
+    )
+    return json_response(changes)
+
+
+def encode_sync_token(date) -> str:
+    """
+    Builds an opaque sync token from the date the catalog was read at.
+    """
+    payload = json.dumps({"t": fields.Datetime.to_string(date)}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_sync_token(token: str) -> datetime:
+    """
+    Extracts the date from a sync token built by `encode_sync_token`.
+
+    Raises:
+    - HTTPException(400): If the token is malformed.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return fields.Datetime.to_datetime(payload["t"])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid sync token") from e
+
 
 def get_description(product):
     """
@@ -126,23 +1024,130 @@ def get_description(product):
         desc= product["description_sale"]
     return desc
 
-def get_image(product):
+def get_image_checksums(env, product_ids, size=512) -> dict:
     """
-    Extracts and returns the encoded image from a product dictionary.
+    Returns the content checksums of the images of several products in one query.
 
-    The function checks if the 'image_512' key in the product dictionary contains
-    an image encoded as bytes. If it does, it returns this encoded image. If not,
-    it returns a default value of bytes([0]).
+    Product images are stored as attachments, whose `checksum` is the SHA-1 of their
+    content, so the checksum changes whenever the image does.
 
     Parameters:
-    - product (dict): A dictionary containing product details, expected to have
-                      a key 'image_512' with its value as bytes representing the image.
+    - env: An instance of the Odoo environment.
+    - product_ids (list[int]): The IDs of the product templates.
+    - size (int): The image variant to look up.
 
     Returns:
-    - bytes: The encoded image as bytes. Returns bytes([0]) if 'image_512' is not
-             a bytes object or is missing.
+    - dict: A mapping of product template ID to image checksum. Products without image
+            are missing from it.
     """
-    
-    if not isinstance(product["image_512"], bytes):
-        product["image_512"] = bytes([0])
-    return product["image_512"]
+    attachments = (
+        env["ir.attachment"]
+        .sudo()
+        .search_read(
+            [
+                ("res_model", "=", "product.template"),
+                ("res_field", "=", f"image_{size}"),
+                ("res_id", "in", product_ids),
+            ],
+            ["res_id", "checksum"],
+        )
+    )
+    return {attachment["res_id"]: attachment["checksum"] for attachment in attachments}
+
+
+def get_image_url(product_id, checksum, size=512) -> str:
+    """
+    Builds the URL of a product image, versioned by the checksum of its content.
+
+    Parameters:
+    - product_id (int): The ID of the product template.
+    - checksum (str | None): The checksum of the image, or None if the product has no
+      image.
+    - size (int): The image variant to point to.
+
+    Returns:
+    - str: The image URL relative to the API root, or the shared placeholder URL.
+    """
+    if not checksum:
+        return IMAGE_PLACEHOLDER_URL
+    version = checksum[:IMAGE_VERSION_LENGTH]
+    return f"/products/{product_id}/image/{size}?v={version}"
+
+
+@lru_cache(maxsize=1)
+def get_placeholder_image() -> bytes:
+    """
+    Returns the bytes of the generic Odoo image placeholder, read once per worker.
+    """
+    with file_open("web/static/img/placeholder.png", "rb") as placeholder:
+        return placeholder.read()
+
+
+@product_router.get(IMAGE_PLACEHOLDER_URL, response_class=Response)
+async def get_image_placeholder() -> Response:
+    """
+    Get the image shared by all the products without image.
+
+    Returns:
+    - Response: The PNG placeholder, cacheable forever.
+    """
+    return placeholder_response()
+
+
+def placeholder_response() -> Response:
+    """
+    Returns a response carrying the image placeholder, cacheable forever.
+    """
+    return Response(
+        content=get_placeholder_image(),
+        media_type="image/png",
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL},
+    )
+
+
+@product_router.get("/products/{product_id}/image/{size}", response_class=Response)
+@orm_route
+def get_product_image(
+    env: Annotated[Environment, Depends(odoo_env)],
+    product_id: int,
+    size: int,
+    v: str | None = None,
+) -> Response:
+    """
+    Get the image of a product.
+
+    When the `v` query parameter is the version of the current image, as in the URLs
+    returned by `/products2`, the response is marked immutable so clients never fetch it
+    again. Otherwise it must be revalidated. Products without image get the placeholder.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+    - product_id (int): The ID of the product template.
+    - size (int): The image variant, one of 128, 256 or 512.
+    - v (str | None): The image version, as found in the image URL.
+
+    Returns:
+    - Response: The raw image bytes.
+
+    Raises:
+    - HTTPException(404): If the size is not supported or the product is not available.
+    """
+    if size not in IMAGE_SIZES:
+        raise HTTPException(status_code=404, detail="Unsupported image size")
+    product = env["product.template"].search(
+        [("id", "=", product_id)] + POS_PRODUCTS_DOMAIN, limit=1
+    )
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    image = product[f"image_{size}"]
+    if not image:
+        return placeholder_response()
+    content = base64.b64decode(image)
+    checksum = get_image_checksums(env, product.ids, size=512).get(product.id, "")
+    immutable = bool(checksum) and v == checksum[:IMAGE_VERSION_LENGTH]
+    return Response(
+        content=content,
+        media_type=guess_mimetype(content, default="image/png"),
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else "no-cache"},
+    )
@@ -0,0 +1,137 @@
+import logging
+import os
+from typing import Annotated
+
+import anyio
+from fastapi import APIRouter, Depends
+
+from odoo.api import Environment
+
+from odoo.addons.fastapi.dependencies import odoo_env
+
+from ..schemas.status import AdmissionStats, AdmissionStatus, Readiness
+from ..utils.concurrency import route_limiters, run_orm
+from ..utils.imports import optional_module
+from ..utils.responses import PosJSONResponse, json_response
+from .categories import build_category_tree
+from .products import (
+    get_cached_catalog,
+    get_catalog_version,
+    get_pos_pricelist,
+    get_pricelist_prices,
+    get_pricelist_version,
+    search_products,
+    search_products2,
+)
+
+_logger = logging.getLogger(__name__)
+
+status_router = APIRouter(tags=["status"], default_response_class=PosJSONResponse)
+
+# The databases whose POS app has been warmed up in this worker.
+WARM_DATABASES = set()
+# Optional dependencies loaded lazily by the responses, imported ahead by the warm-up.
+WARM_MODULES = ("brotli",)
+
+
+@status_router.get("/ready", response_model=Readiness, status_code=200)
+async def get_readiness(env: Annotated[Environment, Depends(odoo_env)]) -> Readiness:
+    """
+    Tell whether the worker serving the request has finished warming up the POS app.
+
+    Proxies should only send traffic to workers answering 200; a worker still warming up
+    answers 503. A worker whose warm-up failed when its registry was loaded tries again.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+
+    Returns:
+    - Readiness: Whether the worker is ready, along with its process ID.
+    """
+    ready = env.cr.dbname in WARM_DATABASES or await run_orm(retry_warm_up, env)
+    return json_response(
+        Readiness(ready=ready, pid=os.getpid()), status_code=200 if ready else 503
+    )
+
+
+def retry_warm_up(env) -> bool:
+    """
+    Warms up the POS routes after a failed warm-up, and marks the database as warm on
+    success.
+
+    Parameters:
+    - env: An instance of the Odoo environment, as the user of the POS endpoint.
+
+    Returns:
+    - bool: Whether the routes were warmed up.
+    """
+    try:
+        with env.cr.savepoint():
+            warm_up(env)
+    except Exception:
+        _logger.warning("Could not warm up the POS routes", exc_info=True)
+        return False
+    WARM_DATABASES.add(env.cr.dbname)
+    return True
+
+
+def warm_up(env):
+    """
+    Fills the per-worker caches read by the POS routes.
+
+    The optional compression module is imported, the current session and its POS
+    configuration are loaded into the lookup cache, and the catalogs, the category tree
+    and the session pricelist prices into the catalog caches.
+
+    Parameters:
+    - env: An instance of the Odoo environment, as the user of the POS endpoint.
+    """
+    for name in WARM_MODULES:
+        optional_module(name)
+    session = env["pos.session"]._get_app_current_session()
+    if session:
+        env["pos.config"]._get_app_pos_info(session["config_id"])
+    catalog_version = get_catalog_version(env)
+    get_cached_catalog(env, "products", catalog_version, search_products)
+    get_cached_catalog(env, "products2", catalog_version, search_products2)
+    get_cached_catalog(
+        env,
+        "categories_tree",
+        catalog_version.variant("categories_tree"),
+        build_category_tree,
+    )
+    pricelist = get_pos_pricelist(env)
+    get_pricelist_prices(
+        env, pricelist, get_pricelist_version(env, pricelist), catalog_version
+    )
+
+
+@status_router.get("/status/admission", response_model=AdmissionStatus, status_code=200)
+async def get_admission_status(
+    env: Annotated[Environment, Depends(odoo_env)],
+) -> AdmissionStatus:
+    """
+    Get the admission control counters.
+
+    Each limited route reports its settings, the number of requests running and queued
+    across all the workers, or in the worker serving the request for per-worker limits,
+    and how many requests that worker admitted, let through without a slot or rejected
+    since it started, either because the queue was full or because they waited too long.
+
+    Parameters:
+    - env: Annotated[Environment, Depends(odoo_env)] - The Odoo environment.
+
+    Returns:
+    - AdmissionStatus: The process ID of the worker and the counters of each limited
+      route.
+    """
+    dbname = env.cr.dbname
+
+    def read_stats():
+        return [
+            AdmissionStats(**limiter.stats(dbname))
+            for limiter in route_limiters.values()
+        ]
+
+    routes = await anyio.to_thread.run_sync(read_stats)
+    return json_response(AdmissionStatus(pid=os.getpid(), routes=routes))
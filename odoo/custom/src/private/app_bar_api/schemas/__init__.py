@@ -1 +1 @@
-from . import product, order, session
+from . import product, order, session, category, status
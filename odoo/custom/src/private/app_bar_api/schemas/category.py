@@ -0,0 +1,11 @@
+from pydantic import BaseModel, TypeAdapter
+
+
+class CategoryNode(BaseModel):
+    id: int
+    name: str
+    product_ids: list[int]
+    children: list["CategoryNode"]
+
+
+CategoryTree = TypeAdapter(list[CategoryNode])
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, TypeAdapter
 
 from .product import ProductLine
 
@@ -9,3 +11,47 @@ class Order(BaseModel):
     client_phone: str
     date_order: str
     notes: str
+    idempotency_key: str | None = None
+
+
+class OrderResult(BaseModel):
+    order_reference: str | None = None
+    error: str | None = None
+
+
+OrderResultList = TypeAdapter(list[OrderResult])
+
+
+class OrderTicket(BaseModel):
+    ticket: str
+    state: str
+    order_reference: str | None = None
+    error: str | None = None
+
+
+class OrderLineInfo(BaseModel):
+    id: int
+    product_id: int | None = None
+    full_product_name: str | None = None
+    qty: float | None = None
+    price_unit: float | None = None
+    price_subtotal_incl: float | None = None
+
+
+class OrderInfo(BaseModel):
+    id: int
+    pos_reference: str | None = None
+    date_order: datetime | None = None
+    amount_total: float | None = None
+    client_phone: str | None = None
+    notes: str | None = None
+    state: str | None = None
+    lines: list[OrderLineInfo] | None = None
+
+
+OrderInfoList = TypeAdapter(list[OrderInfo])
+
+
+class OrderFeed(BaseModel):
+    orders: list[OrderInfo]
+    last_id: int
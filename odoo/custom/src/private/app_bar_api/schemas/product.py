@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
 
 class Product(BaseModel):
@@ -6,6 +6,7 @@ class Product(BaseModel):
     name: str
     categ_id: int
     list_price: float
+    pricelist_price: float | None = None
 
 
 class Product2(BaseModel):
@@ -13,8 +14,19 @@ class Product2(BaseModel):
     name: str
     categ: str
     price: float
-    image: bytes
+    image_url: str
     desc: str
+    pricelist_price: float | None = None
+
+
+ProductList = TypeAdapter(list[Product])
+Product2List = TypeAdapter(list[Product2])
+
+
+class ProductChanges(BaseModel):
+    changed: list[Product2]
+    removed: list[int]
+    token: str
 
 
 class ProductLine(BaseModel):
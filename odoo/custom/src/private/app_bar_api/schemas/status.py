@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+
+
+class AdmissionStats(BaseModel):
+    route: str
+    limit: int
+    queue_size: int
+    timeout: float
+    in_flight: int
+    queued: int
+    per_worker: bool
+    admitted: int
+    exempted: int
+    shed_queue_full: int
+    shed_timeout: int
+    avg_wait: float
+    max_wait: float
+
+
+class AdmissionStatus(BaseModel):
+    pid: int
+    routes: list[AdmissionStats]
+
+
+class Readiness(BaseModel):
+    ready: bool
+    pid: int
@@ -0,0 +1,4 @@
+from . import test_catalog_benchmark
+from . import test_import_time
+from . import test_order_queries
+from . import test_serialization_benchmark
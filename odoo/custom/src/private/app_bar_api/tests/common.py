@@ -0,0 +1,62 @@
+from odoo import fields
+
+from odoo.addons.point_of_sale.tests.common import TestPointOfSaleCommon
+
+from ..routers.orders import get_session
+from ..schemas.order import Order
+
+
+class AppBarApiCommon(TestPointOfSaleCommon):
+    """
+    Opens a POS session and provides the sequences and products orders are created with.
+    """
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.env["ir.sequence"].create(
+            [
+                {"name": "API Orders", "code": "pos.order.pruebas", "prefix": "API/"},
+                {
+                    "name": "API Order Lines",
+                    "code": "pos.order.line.pruebas",
+                    "prefix": "API/L/",
+                },
+            ]
+        )
+        cls.api_products = cls.env["product.product"].create(
+            [
+                {
+                    "name": f"API Product {i}",
+                    "available_in_pos": True,
+                    "list_price": 2.5,
+                }
+                for i in range(15)
+            ]
+        )
+        cls.pos_config.open_ui()
+        cls.session = get_session(cls.env)
+
+    def make_order(self, line_count, **values) -> Order:
+        """
+        Builds an order with `line_count` lines, one per product.
+        """
+        lines = [
+            {
+                "product_id": product.id,
+                "name": product.name,
+                "price_unit": 2.5,
+                "qty": 1,
+                "price_subtotal": 2.5,
+                "price_subtotal_incl": 2.5,
+            }
+            for product in self.api_products[:line_count]
+        ]
+        return Order(
+            products=lines,
+            total=2.5 * line_count,
+            client_phone="",
+            date_order=fields.Datetime.to_string(fields.Datetime.now()),
+            notes="",
+            **values,
+        )
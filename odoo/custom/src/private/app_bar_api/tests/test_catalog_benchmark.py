@@ -0,0 +1,75 @@
+import logging
+import time
+
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+from ..routers.products import (
+    read_products2,
+    search_pos_templates,
+    search_products2_sql,
+)
+
+_logger = logging.getLogger(__name__)
+
+CATALOG_BENCHMARK_SIZE = 10000
+
+
+@tagged("-standard", "benchmark", "post_install", "-at_install")
+class TestCatalogBenchmark(TransactionCase):
+    """
+    Compares the SQL fast path of `/products2` with the ORM path on a large catalog.
+
+    Creating the catalog takes a while, so the benchmark only runs when asked for, with
+    `--test-tags benchmark`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        category = cls.env["product.category"].create({"name": "Benchmark"})
+        cls.env["product.template"].create(
+            [
+                {
+                    "name": f"Benchmark Product {i:05d}",
+                    "categ_id": category.id,
+                    "available_in_pos": True,
+                    "list_price": i % 100 + 0.5,
+                    "description_sale": f"Benchmark description {i}",
+                }
+                for i in range(CATALOG_BENCHMARK_SIZE)
+            ]
+        )
+        # Record rules only apply to users without superuser mode.
+        cls.user_env = cls.env(user=cls.env.ref("base.user_admin"))
+
+    def read_catalog(self, loader) -> tuple:
+        """
+        Reads the catalog with `loader` from empty record caches.
+
+        Returns:
+        - tuple[list, float, int]: The products, and the seconds and queries it took.
+        """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        products = loader(self.user_env)
+        return products, time.perf_counter() - start, self.cr.sql_log_count - queries
+
+    def test_sql_fast_path(self):
+        orm, orm_time, orm_queries = self.read_catalog(
+            lambda env: read_products2(env, search_pos_templates(env))
+        )
+        sql, sql_time, sql_queries = self.read_catalog(search_products2_sql)
+        _logger.info(
+            "%d products: ORM path %.3fs, %d queries; SQL path %.3fs, %d queries",
+            len(orm),
+            orm_time,
+            orm_queries,
+            sql_time,
+            sql_queries,
+        )
+        self.assertGreaterEqual(len(sql), CATALOG_BENCHMARK_SIZE)
+        self.assertEqual(sql, orm)
+        self.assertLess(sql_queries, orm_queries)
@@ -0,0 +1,62 @@
+import logging
+import subprocess
+import sys
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+# Cumulative seconds importing the addon may take, on top of the Odoo core.
+IMPORT_TIME_BUDGET = 1.5
+ADDON_MODULE = "odoo.addons.app_bar_api"
+# Modules only loaded when first used, never by importing the addon. orjson is left out:
+# fastapi.responses imports it whenever it is installed.
+LAZY_MODULES = {"wdb", "brotli"}
+IMPORT_SCRIPT = (
+    "import sys, odoo; "
+    "odoo.tools.config.parse_config(['--addons-path', sys.argv[1]]); "
+    f"import {ADDON_MODULE}"
+)
+
+
+@tagged("post_install", "-at_install")
+class TestImportTime(BaseCase):
+    def import_addon(self) -> dict:
+        """
+        Imports the addon with `-X importtime` in a new interpreter, after Odoo.
+
+        Returns:
+        - dict: The cumulative import time in microseconds, by imported module.
+        """
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                IMPORT_SCRIPT,
+                config["addons_path"],
+            ],
+            capture_output=True,
+            text=True,
+            timeout=120,
+            check=True,
+        )
+        times = {}
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _self, cumulative, name = line.removeprefix("import time:").split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+        return times
+
+    def test_import_time(self):
+        times = self.import_addon()
+        self.assertIn(ADDON_MODULE, times)
+        seconds = times[ADDON_MODULE] / 1e6
+        _logger.info("Importing %s took %.3f seconds", ADDON_MODULE, seconds)
+        self.assertLessEqual(seconds, IMPORT_TIME_BUDGET)
+        self.assertFalse(LAZY_MODULES & set(times), "Optional modules imported eagerly")
@@ -0,0 +1,35 @@
+from odoo.tests import tagged
+
+from ..routers.orders import insert_idempotent_orders
+from .common import AppBarApiCommon
+
+
+@tagged("post_install", "-at_install")
+class TestOrderQueries(AppBarApiCommon):
+    def count_queries(self, order) -> int:
+        """
+        Creates an order with empty record caches, returning the number of queries run.
+        """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        insert_idempotent_orders(self.env, self.session, [order])
+        self.env.flush_all()
+        return self.cr.sql_log_count - start
+
+    def test_order_queries_do_not_grow_with_lines(self):
+        # The first order fills the caches of the session, configuration and sequences.
+        self.count_queries(self.make_order(1))
+        one_line = self.count_queries(self.make_order(1))
+        fifteen_lines = self.count_queries(self.make_order(15))
+        self.assertEqual(fifteen_lines, one_line)
+
+    def test_order_lines_are_created(self):
+        order = insert_idempotent_orders(self.env, self.session, [self.make_order(15)])
+        self.assertEqual(len(order.lines), 15)
+        self.assertEqual(len(set(order.lines.mapped("name"))), 15)
+        self.assertEqual(
+            order.pos_reference,
+            f"Pedido {self.session.id:05d}-{order.app_login_number:03d}"
+            f"-{order.app_sequence_number:04d}",
+        )
@@ -0,0 +1,73 @@
+import json
+import logging
+import timeit
+
+from fastapi.responses import JSONResponse
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..routers.products import get_image_url
+from ..schemas.product import Product2, Product2List
+from ..utils.responses import json_response
+
+_logger = logging.getLogger(__name__)
+
+SERIALIZATION_BENCHMARK_SIZE = 1000
+SERIALIZATION_BENCHMARK_REPEAT = 5
+
+
+def default_response(products) -> bytes:
+    """
+    Serializes products the way FastAPI does for a `response_model`: dumped to dicts,
+    validated again, dumped to JSON-compatible values and encoded by the `json` module.
+    """
+    content = [product.model_dump(by_alias=True) for product in products]
+    value = Product2List.validate_python(content)
+    return JSONResponse(Product2List.dump_python(value, mode="json")).body
+
+
+def pos_response(products) -> bytes:
+    """
+    Serializes products once through their precompiled adapter, like the POS routes.
+    """
+    return json_response(products, Product2List).body
+
+
+@tagged("post_install", "-at_install")
+class TestSerializationBenchmark(BaseCase):
+    """
+    Measures the serialization time of 1k products before and after `json_response`.
+
+    Both timings are only logged, since wall-clock comparisons are not reliable on
+    loaded machines. The test checks that both produce the same JSON.
+    """
+
+    def time_per_run(self, serialize, products) -> float:
+        timer = timeit.Timer(lambda: serialize(products))
+        return min(timer.repeat(repeat=SERIALIZATION_BENCHMARK_REPEAT, number=1))
+
+    def test_serialization(self):
+        products = [
+            Product2(
+                id=i,
+                name=f"Product {i}",
+                categ="All / Drinks",
+                price=i % 100 + 0.5,
+                image_url=get_image_url(i, "0123456789abcdef0123456789abcdef"),
+                desc=f"Description of product {i}",
+            )
+            for i in range(SERIALIZATION_BENCHMARK_SIZE)
+        ]
+        self.assertEqual(
+            json.loads(pos_response(products)), json.loads(default_response(products))
+        )
+        before = self.time_per_run(default_response, products)
+        after = self.time_per_run(pos_response, products)
+        _logger.info(
+            "Serializing %d products: %.2fms through response_model, %.2fms through "
+            "json_response",
+            len(products),
+            before * 1000,
+            after * 1000,
+        )
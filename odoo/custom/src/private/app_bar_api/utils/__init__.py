@@ -0,0 +1,7 @@
+from . import cache
+from . import compression
+from . import concurrency
+from . import imports
+from . import order_feed
+from . import replica
+from . import responses
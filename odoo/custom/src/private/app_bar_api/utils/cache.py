@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+
+CATALOG_CACHE_SIZE = 64
+CATALOG_CACHE_TTL = 600
+PRICE_CACHE_SIZE = 32
+PRICE_CACHE_TTL = 60
+# Lookup entries are checked against their version on every read; the age limit only
+# bounds how long unused entries stay in memory.
+LOOKUP_CACHE_SIZE = 64
+LOOKUP_CACHE_TTL = 3600
+
+
+class LRUCache:
+    """
+    A thread-safe, per-worker cache bounded both in size and in entry age.
+
+    Entries older than `ttl` seconds are treated as missing, and once `maxsize` entries
+    are stored the least recently used one is evicted to make room for a new one.
+
+    Attributes:
+        maxsize (int): The maximum number of entries kept in memory.
+        ttl (float): The number of seconds an entry stays valid after being stored.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for `key`, or `default` if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores `value` for `key`, evicting the least recently used entries if needed.
+
+        The entry stays valid for `ttl` seconds, or the `ttl` of the cache when None.
+        """
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + (self.ttl if ttl is None else ttl),
+                value,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self, predicate=None):
+        """
+        Removes every entry, or only those whose key satisfies `predicate` when given.
+        """
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+
+catalog_cache = LRUCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL)
+price_cache = LRUCache(PRICE_CACHE_SIZE, PRICE_CACHE_TTL)
+lookup_cache = LRUCache(LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL)
+
+
+def catalog_key(env, kind: str) -> tuple:
+    """
+    Builds the `catalog_cache` key of a catalog for the database, companies and language
+    of `env`.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - kind (str): The name of the cached catalog, e.g. "products" or "products2".
+
+    Returns:
+    - tuple: The cache key, starting with the database name.
+    """
+    return (env.cr.dbname, kind, tuple(env.companies.ids), env.lang)
+
+
+def invalidate_catalog(env):
+    """
+    Drops every cached catalog of the database of `env` from this worker.
+
+    Other workers notice the change through the catalog version stored along their
+    entries.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    """
+    dbname = env.cr.dbname
+    catalog_cache.clear(lambda key: key[0] == dbname)
+    price_cache.clear(lambda key: key[0] == dbname)
+
+
+def cached_lookup(env, name: str, key, loader):
+    """
+    Returns the result of a lookup, cached in this worker until the version of `name`
+    changes.
+
+    The version is read from 'pos.api.cache.version' in the transaction of `env`, which
+    also runs `loader` on a miss, so the stored result always matches its version,
+    including when `env` reads from the replica. Results are shared between requests and
+    must not be modified.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - name (str): The name of the lookup, whose version is bumped when the records it
+      reads change.
+    - key: What identifies the result among those of the lookup.
+    - loader (callable): Computes the result when it is missing or outdated.
+
+    Returns:
+    - The result of the lookup.
+    """
+    version = env["pos.api.cache.version"]._get_version(name)
+    cache_key = (env.cr.dbname, name, key)
+    entry = lookup_cache.get(cache_key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    value = loader()
+    lookup_cache.set(cache_key, (version, value))
+    return value
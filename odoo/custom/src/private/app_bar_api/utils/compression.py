@@ -0,0 +1,173 @@
+import gzip
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .imports import optional_module
+
+COMPRESSION_MINIMUM_SIZE = 1024
+COMPRESSION_LEVEL = 6
+BROTLI_QUALITY = 5
+# Media types whose content is already compressed, and gains nothing from another
+# content coding.
+INCOMPRESSIBLE_MEDIA_TYPES = (
+    "image/",
+    "audio/",
+    "video/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-brotli",
+    "application/pdf",
+    "application/octet-stream",
+)
+
+
+def negotiate_encoding(accept_encoding: str):
+    """
+    Picks the content coding to use for a response from an `Accept-Encoding` header.
+
+    Brotli is preferred when the `brotli` package is installed, then gzip. Codings
+    refused with `q=0` are skipped.
+
+    Parameters:
+    - accept_encoding (str): The value of the `Accept-Encoding` request header.
+
+    Returns:
+    - str | None: "br", "gzip", or None when the response must not be compressed.
+    """
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip()
+        refused = quality[2:].strip() in ("0", "0.0", "0.00", "0.000")
+        if quality.startswith("q=") and refused:
+            continue
+        accepted.add(coding.strip())
+    if "br" in accepted and optional_module("brotli") is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def is_compressible(content_type: str) -> bool:
+    """
+    Tells whether a response with the given `Content-Type` is worth compressing.
+
+    Responses of the `INCOMPRESSIBLE_MEDIA_TYPES` are not. All the image types are
+    skipped, SVG included, which is rare among product images.
+    """
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return not media_type.startswith(INCOMPRESSIBLE_MEDIA_TYPES)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compresses a whole body with the given content coding.
+    """
+    if encoding == "br":
+        return optional_module("brotli").compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESSION_LEVEL)
+
+
+class _Compressor:
+    """
+    Incrementally compresses a streamed body with the given content coding.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            brotli = optional_module("brotli")
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        data = self._compressor.compress(data)
+        return data + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    An ASGI middleware compressing responses according to the `Accept-Encoding` header.
+
+    Responses smaller than `minimum_size`, responses without body, responses that
+    already carry a `Content-Encoding`, such as the pre-compressed catalogs, and
+    responses whose media type is already compressed, such as product images, are sent
+    untouched.
+
+    Attributes:
+        app: The wrapped ASGI application.
+        minimum_size (int): The body size, in bytes, below which responses are not
+            compressed.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if (
+                    "content-encoding" in headers
+                    or not is_compressible(headers.get("content-type", ""))
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                compressor = _Compressor(encoding)
+                if not more_body:
+                    body = compress(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                del headers["Content-Length"]
+                await send(start_message)
+
+            body = compressor.compress(body)
+            if not more_body:
+                body += compressor.finish()
+            await send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,501 @@
+import asyncio
+import functools
+import logging
+import math
+import os
+import threading
+import time
+import weakref
+import zlib
+from typing import Annotated
+
+import anyio
+import psycopg2
+from fastapi import Depends, HTTPException, Request
+
+from odoo import sql_db
+from odoo.api import Environment
+
+from odoo.addons.fastapi.dependencies import odoo_env
+
+_logger = logging.getLogger(__name__)
+
+ORM_THREADS = 16
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_QUEUE_TIMEOUT = 5
+ADMISSION_PARAM_PREFIX = "app_bar_api.admission"
+SETTINGS_TTL = 60
+# Seconds between the first two attempts of a queued request to take a running slot,
+# doubled after each attempt up to ADMISSION_MAX_POLL_INTERVAL.
+ADMISSION_POLL_INTERVAL = 0.05
+ADMISSION_MAX_POLL_INTERVAL = 0.5
+# Slot of the requests admitted while the admission locks cannot be taken.
+UNLIMITED_SLOT = -1
+
+# The admission limiters of the POS routes, by name.
+route_limiters = {}
+
+
+class LoopLocal:
+    """
+    Holds one object per running event loop, built on first use by `factory`.
+
+    Asyncio primitives are bound to the event loop they are first used in, while the
+    FastAPI app of an endpoint, and the event loop running it, are rebuilt whenever the
+    registry caches are cleared. Objects are dropped along with the event loop they
+    belong to.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._objects = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns the object of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            obj = self._objects.get(loop)
+            if obj is None:
+                obj = self._objects[loop] = self._factory()
+            return obj
+
+
+_orm_limiters = LoopLocal(lambda: anyio.CapacityLimiter(ORM_THREADS))
+
+
+async def run_orm(func, *args, **kwargs):
+    """
+    Runs blocking ORM work in a worker thread, so that it does not stall the event loop.
+
+    At most `ORM_THREADS` calls run at once, the others wait for a free thread. A call
+    must only use the cursor of its own request, which no other thread uses meanwhile.
+
+    Parameters:
+    - func: The function to run, followed by its arguments.
+
+    Returns:
+    - The result of `func`.
+    """
+    return await anyio.to_thread.run_sync(
+        functools.partial(func, *args, **kwargs), limiter=_orm_limiters.get()
+    )
+
+
+def orm_route(func):
+    """
+    Turns a blocking route function into a coroutine running it with `run_orm`.
+
+    The signature of `func` is kept, so FastAPI resolves its parameters and dependencies
+    as usual. It must be applied below the route decorator.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_orm(func, *args, **kwargs)
+
+    return wrapper
+
+
+class AdmissionLocks:
+    """
+    Counts the admission slots of the routes across all the workers of a database, with
+    PostgreSQL advisory locks.
+
+    A slot is a session-level advisory lock on the two keys (route key, slot number).
+    Each worker process takes the locks of its requests on a connection of its own, in
+    autocommit mode, so they neither depend on the transactions of the requests nor
+    survive the process. The connection is shared by the threads of the process, which
+    psycopg2 allows, and `_lock` only guards the bookkeeping, never a query.
+
+    Advisory locks are reentrant within a connection, so the slots held by the process
+    are also tracked here, and skipped when looking for a free one. A slot taken twice
+    by concurrent requests of the process is unlocked once more and looked for again.
+
+    When the locks cannot be taken, such as while the database restarts, requests are
+    admitted without slot rather than rejected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._held = set()
+
+    def _connection(self, dbname):
+        pid = os.getpid()
+        with self._lock:
+            entry = self._connections.get(dbname)
+            if entry is not None and entry[0] == pid and not entry[1].closed:
+                return entry[1]
+        _db, connection_info = sql_db.connection_info_for(dbname)
+        connection = psycopg2.connect(**connection_info)
+        connection.autocommit = True
+        with self._lock:
+            entry = self._connections.get(dbname)
+            if entry is not None and entry[0] == pid and not entry[1].closed:
+                # Another request of the process connected meanwhile.
+                connection.close()
+                return entry[1]
+            self._connections[dbname] = (pid, connection)
+            self._held = {held for held in self._held if held[0] != dbname}
+        return connection
+
+    def _discard(self, dbname, connection):
+        # Closing the connection releases all its locks.
+        with self._lock:
+            entry = self._connections.get(dbname)
+            if entry is None or entry[1] is not connection:
+                return
+            del self._connections[dbname]
+            self._held = {held for held in self._held if held[0] != dbname}
+        if entry[0] == os.getpid():
+            connection.close()
+
+    def try_acquire(self, dbname, key, size) -> int | None:
+        """
+        Takes a free slot among the `size` slots of `key`, without waiting.
+
+        Returns:
+        - int | None: The slot taken, `UNLIMITED_SLOT` if the locks cannot be taken, or
+          None if all the slots are taken.
+        """
+        connection = None
+        try:
+            connection = self._connection(dbname)
+            while True:
+                with self._lock:
+                    held = [
+                        slot for db, k, slot in self._held if db == dbname and k == key
+                    ]
+                with connection.cursor() as cr:
+                    # The CASE makes sure no lock is taken again on a slot held by the
+                    # process.
+                    cr.execute(
+                        """
+                        SELECT slot
+                          FROM generate_series(0, %s - 1) slot
+                         WHERE CASE WHEN slot = ANY(%s) THEN false
+                                    ELSE pg_try_advisory_lock(%s, slot)
+                               END
+                         LIMIT 1
+                        """,
+                        (size, held, key),
+                    )
+                    row = cr.fetchone()
+                if row is None:
+                    return None
+                with self._lock:
+                    if self._connections.get(dbname, (None, None))[1] is not connection:
+                        return UNLIMITED_SLOT
+                    if (dbname, key, row[0]) not in self._held:
+                        self._held.add((dbname, key, row[0]))
+                        return row[0]
+                with connection.cursor() as cr:
+                    cr.execute("SELECT pg_advisory_unlock(%s, %s)", (key, row[0]))
+        except psycopg2.Error:
+            _logger.warning("Could not take an admission slot", exc_info=True)
+            if connection is not None:
+                self._discard(dbname, connection)
+            return UNLIMITED_SLOT
+
+    def release(self, dbname, key, slot):
+        """
+        Releases a slot taken with `try_acquire`.
+        """
+        with self._lock:
+            if (dbname, key, slot) not in self._held:
+                return
+            self._held.discard((dbname, key, slot))
+            entry = self._connections.get(dbname)
+            if entry is None or entry[0] != os.getpid():
+                return
+            connection = entry[1]
+        try:
+            with connection.cursor() as cr:
+                cr.execute("SELECT pg_advisory_unlock(%s, %s)", (key, slot))
+        except psycopg2.Error:
+            _logger.warning("Could not release an admission slot", exc_info=True)
+            self._discard(dbname, connection)
+
+    def count(self, dbname, key) -> int:
+        """
+        Returns the number of slots of `key` taken by all the workers of the database.
+        """
+        connection = None
+        try:
+            connection = self._connection(dbname)
+            with connection.cursor() as cr:
+                cr.execute(
+                    """
+                    SELECT count(*)
+                      FROM pg_locks
+                     WHERE locktype = 'advisory'
+                       AND database = (
+                               SELECT oid FROM pg_database
+                                WHERE datname = current_database()
+                           )
+                       AND classid = %s
+                       AND objsubid = 2
+                       AND granted
+                    """,
+                    (key,),
+                )
+                return cr.fetchone()[0]
+        except psycopg2.Error:
+            _logger.warning("Could not count the admission slots", exc_info=True)
+            if connection is not None:
+                self._discard(dbname, connection)
+            return 0
+
+
+class WorkerSlots:
+    """
+    Counts the admission slots of the routes within this worker process only, with the
+    same interface as `AdmissionLocks`.
+
+    Used by the routes whose requests mostly hold a worker rather than the database,
+    such as long-polls, so that their limit grows with the number of workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._taken = {}
+
+    def try_acquire(self, dbname, key, size) -> int | None:
+        """
+        Takes one of the `size` slots of `key`, without waiting.
+
+        Returns:
+        - int | None: The number of slots taken before, or None if all the slots are
+          taken.
+        """
+        with self._lock:
+            taken = self._taken.get((dbname, key), 0)
+            if taken >= size:
+                return None
+            self._taken[(dbname, key)] = taken + 1
+            return taken
+
+    def release(self, dbname, key, slot):
+        """
+        Releases a slot taken with `try_acquire`.
+        """
+        with self._lock:
+            self._taken[(dbname, key)] -= 1
+
+    def count(self, dbname, key) -> int:
+        """
+        Returns the number of slots of `key` taken in this worker.
+        """
+        with self._lock:
+            return self._taken.get((dbname, key), 0)
+
+
+admission_locks = AdmissionLocks()
+worker_slots = WorkerSlots()
+
+
+def admission_key(name) -> int:
+    """
+    Returns the advisory lock key of the slots with the given name, a positive 32-bit
+    integer.
+    """
+    return zlib.crc32(f"{ADMISSION_PARAM_PREFIX}.{name}".encode()) & 0x7FFFFFFF
+
+
+class RouteLimiter:
+    """
+    A FastAPI dependency applying admission control to a route.
+
+    At most `limit` requests of the route run at once across all the workers of a
+    database, whether they are prefork, threaded or gevent workers, or within each
+    worker with `per_worker`. Requests over the limit wait in a queue of at most
+    `queue_size` requests, for up to `timeout` seconds, trying again for a free slot
+    after `ADMISSION_POLL_INTERVAL` seconds, then less and less often. Requests finding
+    the queue full, or still waiting after the timeout, are rejected early with a 503
+    error and a `Retry-After` header, instead of piling up behind locks until clients
+    time out and retry. Running and queued requests hold slots counted with advisory
+    locks, see `AdmissionLocks`, or in the worker, see `WorkerSlots`.
+
+    Requests for which `exempt`, called with the environment and the request in an ORM
+    thread, returns True are let through without a slot, such as cheap conditional
+    requests answered with a 304.
+
+    The defaults given to the constructor can be overridden with the system parameters
+    `app_bar_api.admission.<name>.limit`, `.queue_size` and `.timeout`, which are read
+    again every `SETTINGS_TTL` seconds. The counters of every limiter are available
+    through `stats`.
+
+    Attributes:
+        name (str): The name of the limited route, used in parameters and error
+            messages.
+        limit (int): The maximum number of requests running at once.
+        queue_size (int): The maximum number of requests waiting for a slot.
+        timeout (float): The number of seconds a request may wait for a slot.
+        per_worker (bool): Whether the limits apply to each worker rather than to all
+            the workers of the database.
+        exempt: An optional callable telling whether a request needs no slot.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        timeout: float = DEFAULT_QUEUE_TIMEOUT,
+        per_worker: bool = False,
+        exempt=None,
+    ):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.per_worker = per_worker
+        self.exempt = exempt
+        self._slots = worker_slots if per_worker else admission_locks
+        self._defaults = (limit, queue_size, timeout)
+        self._settings_expire = 0
+        self._run_key = admission_key(f"{name}.run")
+        self._queue_key = admission_key(f"{name}.queue")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._exempted = 0
+        self._shed_queue_full = 0
+        self._shed_timeout = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        route_limiters[name] = self
+
+    async def __call__(
+        self, env: Annotated[Environment, Depends(odoo_env)], request: Request
+    ):
+        if self._settings_expire < time.monotonic():
+            await run_orm(self.load_settings, env)
+        if self.exempt is not None and await run_orm(self.exempt, env, request):
+            with self._lock:
+                self._exempted += 1
+            yield
+            return
+        dbname = env.cr.dbname
+        start = time.monotonic()
+        slot = None
+        try:
+            slot = await self._acquire(dbname, start)
+            wait = time.monotonic() - start
+            with self._lock:
+                self._admitted += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            yield
+        finally:
+            if slot is not None:
+                with anyio.CancelScope(shield=True):
+                    await anyio.to_thread.run_sync(
+                        self._slots.release, dbname, self._run_key, slot
+                    )
+
+    async def _acquire(self, dbname, start) -> int:
+        """
+        Takes a running slot, waiting in the queue if needed.
+
+        Returns:
+        - int: The running slot taken.
+
+        Raises:
+        - HTTPException(503): If the queue is full, or no slot was freed in time.
+        """
+
+        def try_acquire(key, size):
+            return anyio.to_thread.run_sync(self._slots.try_acquire, dbname, key, size)
+
+        slot = await try_acquire(self._run_key, self.limit)
+        if slot is not None:
+            return slot
+        queue_slot = await try_acquire(self._queue_key, self.queue_size)
+        if queue_slot is None:
+            with self._lock:
+                self._shed_queue_full += 1
+            raise self._overloaded()
+        try:
+            deadline = start + self.timeout
+            interval = ADMISSION_POLL_INTERVAL
+            while slot is None and time.monotonic() < deadline:
+                await anyio.sleep(min(interval, max(0, deadline - time.monotonic())))
+                interval = min(interval * 2, ADMISSION_MAX_POLL_INTERVAL)
+                slot = await try_acquire(self._run_key, self.limit)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(
+                    self._slots.release, dbname, self._queue_key, queue_slot
+                )
+        if slot is None:
+            with self._lock:
+                self._shed_timeout += 1
+            raise self._overloaded()
+        return slot
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"Too many concurrent {self.name} requests",
+            headers={"Retry-After": str(max(1, math.ceil(self.timeout)))},
+        )
+
+    def load_settings(self, env):
+        """
+        Reads the admission settings of the route from the system parameters.
+
+        Invalid values are logged and replaced by the defaults given to the constructor.
+        """
+        get_param = env["ir.config_parameter"].sudo().get_param
+        limit, queue_size, timeout = self._defaults
+        prefix = f"{ADMISSION_PARAM_PREFIX}.{self.name}"
+        try:
+            limit = max(1, int(get_param(f"{prefix}.limit", limit)))
+            queue_size = max(0, int(get_param(f"{prefix}.queue_size", queue_size)))
+            timeout = max(0.0, float(get_param(f"{prefix}.timeout", timeout)))
+        except ValueError:
+            _logger.warning(
+                "Invalid admission settings for %s, using the defaults", self.name
+            )
+            limit, queue_size, timeout = self._defaults
+        self.limit, self.queue_size, self.timeout = limit, queue_size, timeout
+        self._settings_expire = time.monotonic() + SETTINGS_TTL
+
+    def stats(self, dbname) -> dict:
+        """
+        Returns the settings and counters of the limiter.
+
+        The running and queued requests are counted across all the workers of the
+        database, unless the limits apply to each worker, the other counters only cover
+        the requests of this worker.
+
+        Parameters:
+        - dbname (str): The name of the database.
+
+        Returns:
+        - dict: The current number of running and queued requests, the number of
+          admitted, exempted and rejected requests, and the average and maximum seconds
+          admitted requests waited for.
+        """
+        in_flight = self._slots.count(dbname, self._run_key)
+        queued = self._slots.count(dbname, self._queue_key)
+        with self._lock:
+            avg_wait = self._total_wait / self._admitted if self._admitted else 0.0
+            return {
+                "route": self.name,
+                "limit": self.limit,
+                "queue_size": self.queue_size,
+                "timeout": self.timeout,
+                "in_flight": in_flight,
+                "queued": queued,
+                "per_worker": self.per_worker,
+                "admitted": self._admitted,
+                "exempted": self._exempted,
+                "shed_queue_full": self._shed_queue_full,
+                "shed_timeout": self._shed_timeout,
+                "avg_wait": avg_wait,
+                "max_wait": self._max_wait,
+            }
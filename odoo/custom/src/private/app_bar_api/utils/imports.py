@@ -0,0 +1,20 @@
+import functools
+import importlib
+
+
+@functools.cache
+def optional_module(name: str):
+    """
+    Imports an optional dependency on first use, so that importing the addon does not
+    load it.
+
+    Parameters:
+    - name (str): The name of the module, such as "brotli".
+
+    Returns:
+    - module | None: The module, or None if it is not installed.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import selectors
+import threading
+import time
+
+import odoo
+
+_logger = logging.getLogger(__name__)
+
+ORDER_FEED_CHANNEL = "app_bar_api_orders"
+LISTEN_TIMEOUT = 50
+RECONNECT_DELAY = 5
+# Seconds a request waits for the listener of its worker to be listening.
+LISTEN_READY_TIMEOUT = 5
+
+
+def notify_orders(env, session_id, order_ids):
+    """
+    Announces new orders of a session to the order feed listeners of every worker.
+
+    The notification is sent with `pg_notify` in the current transaction, so PostgreSQL
+    only delivers it once the orders are committed, and drops it if they are rolled
+    back.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+    - session_id (int): The ID of the POS session of the orders.
+    - order_ids (list[int]): The IDs of the new orders.
+    """
+    env.cr.execute(
+        "SELECT pg_notify(%s, %s)",
+        (
+            ORDER_FEED_CHANNEL,
+            json.dumps({"session_id": session_id, "order_ids": order_ids}),
+        ),
+    )
+
+
+class OrderFeed:
+    """
+    Fans out the order notifications of a database to the requests waiting in this
+    worker.
+
+    A single daemon thread per database and worker process keeps a `LISTEN` connection
+    open, and wakes up the requests waiting on the session the new orders belong to.
+    Each session has a version, changed on every notification, that waiting requests
+    compare against the one they read before querying, so no notification is missed in
+    between. The version is only returned once the listener is listening, and changes
+    for every session whenever the listener reconnects, since notifications sent while
+    it was disconnected are lost.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions = {}
+        self._generations = {}
+        self._listeners = {}
+
+    def version(self, dbname, session_id) -> tuple:
+        """
+        Returns the current notification version of a session, starting the listener if
+        needed and waiting for it to be listening.
+        """
+        self._ensure_listener(dbname)
+        with self._condition:
+            return self._version((dbname, session_id))
+
+    def _version(self, key):
+        return self._generations.get(key[0], 0), self._versions.get(key, 0)
+
+    def wait(self, dbname, session_id, version, timeout) -> bool:
+        """
+        Blocks until the session gets past `version` or `timeout` seconds have elapsed.
+
+        Returns:
+        - bool: True if new orders were notified for the session, or if the listener
+          reconnected meanwhile.
+        """
+        key = (dbname, session_id)
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._version(key) != version, timeout=timeout
+            )
+
+    def _ensure_listener(self, dbname):
+        pid = os.getpid()
+        listener = self._listeners.get(dbname)
+        if not (listener and listener[0] == pid and listener[1].is_alive()):
+            with self._condition:
+                listener = self._listeners.get(dbname)
+                if not (listener and listener[0] == pid and listener[1].is_alive()):
+                    ready = threading.Event()
+                    thread = threading.Thread(
+                        target=self._listen,
+                        args=(dbname, ready),
+                        name=f"app_bar_api.order_feed.{dbname}",
+                        daemon=True,
+                    )
+                    listener = self._listeners[dbname] = (pid, thread, ready)
+                    thread.start()
+        if not listener[2].wait(LISTEN_READY_TIMEOUT):
+            _logger.warning("Order feed listener of %s is not listening yet", dbname)
+
+    def _listen(self, dbname, ready):
+        while True:
+            try:
+                self._loop(dbname, ready)
+            except Exception:
+                _logger.exception(
+                    "Order feed listener of %s failed, reconnecting", dbname
+                )
+                time.sleep(RECONNECT_DELAY)
+
+    def _loop(self, dbname, ready):
+        with (
+            odoo.sql_db.db_connect(dbname).cursor() as cr,
+            selectors.DefaultSelector() as sel,
+        ):
+            cr.execute(f"LISTEN {ORDER_FEED_CHANNEL}")
+            cr.commit()
+            with self._condition:
+                self._generations[dbname] = self._generations.get(dbname, 0) + 1
+                self._condition.notify_all()
+            ready.set()
+            conn = cr._cnx
+            sel.register(conn, selectors.EVENT_READ)
+            while True:
+                if not sel.select(LISTEN_TIMEOUT):
+                    continue
+                conn.poll()
+                session_ids = set()
+                while conn.notifies:
+                    session_ids.add(
+                        json.loads(conn.notifies.pop().payload)["session_id"]
+                    )
+                with self._condition:
+                    for session_id in session_ids:
+                        key = (dbname, session_id)
+                        self._versions[key] = self._versions.get(key, 0) + 1
+                    self._condition.notify_all()
+
+
+order_feed = OrderFeed()
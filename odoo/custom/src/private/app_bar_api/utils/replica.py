@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit
+
+import psycopg2
+
+from odoo import sql_db
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+# Options of the Odoo configuration file. The DSN is a `postgresql://` URI of the
+# replica server; the database name is always the one of the request.
+REPLICA_DSN_OPTION = "app_bar_api_replica_dsn"
+REPLICA_MAX_LAG_OPTION = "app_bar_api_replica_max_lag"
+DEFAULT_REPLICA_MAX_LAG = 10
+REPLICA_RETRY_DELAY = 30
+
+# How often, in seconds, each worker samples the WAL position of the primary.
+PRIMARY_POSITION_INTERVAL = 1
+
+# WAL positions, in bytes, of the primary and of the replay on the replica. The replica
+# is not compared with its own receive position, which stops moving when the WAL
+# receiver disconnects.
+PRIMARY_POSITION_QUERY = "SELECT pg_current_wal_lsn() - '0/0'::pg_lsn"
+REPLICA_POSITION_QUERY = "SELECT pg_last_wal_replay_lsn() - '0/0'::pg_lsn"
+
+_unavailable_until = {}
+_unavailable_lock = threading.Lock()
+_primary_positions = {}
+_primary_positions_lock = threading.Lock()
+
+
+def get_replica_uri(dbname):
+    """
+    Returns the URI of the database `dbname` on the replica, or None if no replica is
+    configured.
+    """
+    dsn = config.get(REPLICA_DSN_OPTION)
+    if not dsn:
+        return None
+    return urlunsplit(urlsplit(dsn)._replace(path="/" + dbname))
+
+
+def get_replica_max_lag() -> float:
+    """
+    Returns the delay, in seconds, over which reads fall back to the primary.
+    """
+    return float(config.get(REPLICA_MAX_LAG_OPTION) or DEFAULT_REPLICA_MAX_LAG)
+
+
+def get_primary_position(cr, max_lag) -> int:
+    """
+    Returns a WAL position the primary had already reached `max_lag` seconds ago.
+
+    The current position of the primary is sampled at most every
+    `PRIMARY_POSITION_INTERVAL` seconds in each worker, and the newest sample at least
+    `max_lag` seconds old is returned. Until there is such a sample, the oldest one is
+    returned, which is only more demanding.
+
+    Parameters:
+    - cr: A cursor on the primary.
+    - max_lag (float): The number of seconds the replica may lag behind.
+
+    Returns:
+    - int: The WAL position, in bytes.
+    """
+    now = time.monotonic()
+    with _primary_positions_lock:
+        samples = _primary_positions.setdefault(cr.dbname, deque())
+        sample = not samples or samples[-1][0] <= now - PRIMARY_POSITION_INTERVAL
+    if sample:
+        cr.execute(PRIMARY_POSITION_QUERY)
+        position = int(cr.fetchone()[0])
+    with _primary_positions_lock:
+        if sample:
+            samples.append((now, position))
+        while len(samples) > 1 and samples[1][0] <= now - max_lag:
+            samples.popleft()
+        return samples[0][1]
+
+
+def replica_cursor(primary_cr):
+    """
+    Opens a read-only cursor on the replica, if it is configured, reachable and up to
+    date.
+
+    The replica is up to date when it has replayed everything the primary had written
+    `get_replica_max_lag` seconds ago, see `get_primary_position`. The positions are
+    compared in the WAL, so a replica whose WAL receiver is disconnected falls behind as
+    soon as the primary writes, and the clocks of the servers do not matter.
+
+    A replica that cannot be reached, or is not replaying a primary, is not tried again
+    in this worker for `REPLICA_RETRY_DELAY` seconds.
+
+    Parameters:
+    - primary_cr: The cursor of the request on the primary.
+
+    Returns:
+    - Cursor | None: The replica cursor, or None if reads must go to the primary.
+    """
+    uri = get_replica_uri(primary_cr.dbname)
+    if not uri:
+        return None
+    with _unavailable_lock:
+        if _unavailable_until.get(uri, 0) > time.monotonic():
+            return None
+    max_lag = get_replica_max_lag()
+    required_position = get_primary_position(primary_cr, max_lag)
+    cr = None
+    try:
+        cr = sql_db.db_connect(uri, allow_uri=True).cursor()
+        cr.execute("SET TRANSACTION READ ONLY")
+        cr.execute(REPLICA_POSITION_QUERY)
+        position = cr.fetchone()[0]
+    except psycopg2.Error:
+        _logger.warning(
+            "The read replica is not available, reading from the primary", exc_info=True
+        )
+        position = None
+    else:
+        if position is None:
+            _logger.warning(
+                "The read replica is not replaying a primary, reading from the primary"
+            )
+    if position is None:
+        if cr is not None:
+            cr.close()
+        with _unavailable_lock:
+            _unavailable_until[uri] = time.monotonic() + REPLICA_RETRY_DELAY
+        return None
+    if position < required_position:
+        _logger.info(
+            "The read replica is more than %s seconds behind, reading from the primary",
+            max_lag,
+        )
+        cr.close()
+        return None
+    return cr
+
+
+@contextmanager
+def read_only_env(env):
+    """
+    Provides an environment reading from the replica, or `env` itself when the replica
+    is not configured, not reachable or lagging behind.
+
+    The cursor of the replica environment is closed, without committing, on exit. It
+    must not be used to write, which the replica, being a standby, refuses anyway.
+
+    Parameters:
+    - env: An instance of the Odoo environment.
+
+    Yields:
+    - Environment: The environment to read with.
+    """
+    cr = replica_cursor(env.cr)
+    if cr is None:
+        yield env
+        return
+    try:
+        yield env(cr=cr)
+    finally:
+        cr.close()
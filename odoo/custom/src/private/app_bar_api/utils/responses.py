@@ -0,0 +1,49 @@
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+# fastapi.responses already imports orjson when it is installed, so this costs nothing.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class PosJSONResponse(JSONResponse):
+    """
+    The JSON response class of the POS routers.
+
+    Content already serialized to bytes, as built by `json_response`, is sent as is.
+    Other content is encoded with orjson when it is installed, or with pydantic-core
+    otherwise, both much faster than the standard library encoder used by
+    `JSONResponse`.
+    """
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if orjson is not None:
+            return orjson.dumps(content)
+        return to_json(content)
+
+
+def json_response(
+    content, adapter=None, status_code=200, headers=None
+) -> PosJSONResponse:
+    """
+    Serializes pydantic content once and wraps it in a PosJSONResponse.
+
+    Returning this response from a route skips the validation and encoding FastAPI would
+    otherwise run against the `response_model` of the route.
+
+    Parameters:
+    - content: A pydantic model, or any value `adapter` can serialize.
+    - adapter (TypeAdapter | None): A precompiled adapter for `content`, such as
+      `ProductList`.
+    - status_code (int): The HTTP status code of the response.
+    - headers (dict | None): Extra headers to send.
+
+    Returns:
+    - PosJSONResponse: The response carrying the serialized content.
+    """
+    body = adapter.dump_json(content) if adapter is not None else to_json(content)
+    return PosJSONResponse(content=body, status_code=status_code, headers=headers)